@@ -0,0 +1,155 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Answers are reused for this many seconds, then asked again
+ANSWER_CACHE_TTL_S = float(os.getenv("ANSWER_CACHE_TTL_S", "86400"))
+# Answers kept across all documents; the least recently used are evicted first
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+# Cosine similarity of the question embeddings above which a differently worded question gets the cached answer;
+# ada-002 similarities are compressed toward 1, unrelated questions about the same topic often score above 0.9
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.97"))
+
+QUESTION_PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+
+
+def normalize_question(question):
+    """
+    Reduce a question to the form it is cached under: lowercase, without punctuation nor repeated whitespace.
+
+    Args:
+    - question (str): The question.
+
+    Returns:
+    - str: The normalized question.
+    """
+    return " ".join(QUESTION_PUNCTUATION_PATTERN.sub(" ", question.lower()).split())
+
+
+class _CachedAnswer:
+    def __init__(self, answer, embedding, key_tokens):
+        self.answer = answer
+        self.embedding = embedding
+        self.key_tokens = key_tokens
+        self.created_at = time.monotonic()
+
+
+class AnswerCache:
+    """
+    Process-wide cache of chat answers, keyed by document hash and normalized question, shared by every session.
+
+    A question is answered from the cache when its normalized form was asked about the same document before, or
+    when a question asked before has the same key tokens (section numbers, model numbers, rare terms, see
+    lexical_index.key_tokens) and an embedding at least similarity close to its own.
+
+    Attributes:
+    - ttl_s (float): The time an answer is reused for, in seconds.
+    - max_entries (int): The number of answers kept.
+    - similarity (float): The cosine similarity threshold of near-duplicate questions.
+    - hits (int): The questions answered from the cache.
+    - misses (int): The questions not found in the cache.
+    """
+
+    def __init__(self, ttl_s=ANSWER_CACHE_TTL_S, max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                 similarity=ANSWER_CACHE_SIMILARITY):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, entry, now):
+        return now - entry.created_at > self.ttl_s
+
+    def _hit(self, key):
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return self._entries[key].answer
+
+    def _get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and self._expired(entry, now):
+            del self._entries[key]
+            entry = None
+        return self._hit(key) if entry is not None else None
+
+    def _get_similar(self, document_hash, question_embedding, key_tokens, now):
+        keys = [key for key, entry in self._entries.items()
+                if key[0] == document_hash and entry.embedding is not None and entry.key_tokens == key_tokens
+                and not self._expired(entry, now)]
+        if keys:
+            similarities = np.stack([self._entries[key].embedding for key in keys]) @ question_embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.similarity:
+                return self._hit(keys[best])
+        return None
+
+    def lookup(self, document_hash, question, embed=None, key_tokens=frozenset()):
+        """
+        Look up the answer to a question: asked before in the same words, or else, if embed is given, a near duplicate.
+
+        Args:
+        - document_hash (str): The hash of the document the question is about.
+        - question (str): The question.
+        - embed (callable, optional): Returns the embedding of the question; only called when the exact lookup
+          misses. Without it there is no near-duplicate lookup. Defaults to None.
+        - key_tokens (frozenset, optional): The key tokens of the question, which a near duplicate must share.
+
+        Returns:
+        - tuple: The cached answer or None, and the embedding of the question if it was computed, else None.
+        """
+        key = (document_hash, normalize_question(question))
+        with self._lock:
+            answer = self._get(key, time.monotonic())
+        question_embedding = None
+        if answer is None and embed is not None:
+            question_embedding = np.asarray(embed(), dtype=np.float32)
+            normalized = question_embedding / (np.linalg.norm(question_embedding) or 1.0)
+            with self._lock:
+                answer = self._get_similar(document_hash, normalized, key_tokens, time.monotonic())
+        if answer is None:
+            with self._lock:
+                self.misses += 1
+        return answer, question_embedding
+
+    def put(self, document_hash, question, answer, question_embedding=None, key_tokens=frozenset()):
+        """
+        Cache the answer to a question, evicting expired answers and then the least recently used ones.
+
+        Args:
+        - document_hash (str): The hash of the document the question is about.
+        - question (str): The question.
+        - answer (str): The answer.
+        - question_embedding (numpy.ndarray, optional): The embedding of the question, for near-duplicate lookups.
+        - key_tokens (frozenset, optional): The key tokens of the question, see lookup.
+        """
+        if question_embedding is not None:
+            question_embedding = np.asarray(question_embedding, dtype=np.float32)
+            question_embedding = question_embedding / (np.linalg.norm(question_embedding) or 1.0)
+        key = (document_hash, normalize_question(question))
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = _CachedAnswer(answer, question_embedding, key_tokens)
+            self._entries.move_to_end(key)
+            for expired_key in [key for key, entry in self._entries.items() if self._expired(entry, now)]:
+                del self._entries[expired_key]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """
+        Report the cache counters.
+
+        Returns:
+        - dict: The hit and miss counts and the number of answers held.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+answer_cache = AnswerCache()
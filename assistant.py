@@ -1,11 +1,10 @@
 import streamlit as st
 import io
-import time
 import json
 from openai.types.beta.threads.text_content_block import TextContentBlock
 from openai.types.beta.threads.image_file_content_block import ImageFileContentBlock
 
-from open_ai_api_calls import client, create_OpenAI_thread, create_OpenAI_message, run_OpenAI_thread, retrieve_OpenAI_run, retreive_OpenAI_messages
+from open_ai_api_calls import client, create_OpenAI_thread, create_OpenAI_message, run_OpenAI_thread, retreive_OpenAI_messages
 
 def extract_content(message):
     text = ''
@@ -32,9 +31,11 @@ def calculate_cost(usage, session_id):
 
     return cost_USD
 
-def run_OpenAI_assistant(assistant_id, prompt, model='gpt-4o-mini', role='user', file_ids=[], metadata=None, thread_id=None, session_id=None, page=None):
+def stream_OpenAI_assistant(assistant_id, prompt, model='gpt-4o-mini', role='user', file_ids=[], metadata=None, thread_id=None, session_id=None, page=None, result=None):
     """
-    Runs the OpenAI assistant with the given parameters.
+    Runs the OpenAI assistant with the given parameters and streams its response as it is generated.
+
+    The run is created with stream=True, so the response arrives as server-sent events instead of being polled for.
 
     Args:
     - assistant_id (str): The ID of the OpenAI assistant to run.
@@ -43,16 +44,17 @@ def run_OpenAI_assistant(assistant_id, prompt, model='gpt-4o-mini', role='user',
     - file_ids (list, optional): A list of file IDs to send along with the prompt. Defaults to [].
     - metadata (dict, optional): A dictionary of metadata to send along with the prompt. Defaults to None.
     - thread_id (str, optional): The ID of the thread to send the prompt to. If None, a new thread will be created. Defaults to None.
-
-    Returns:
-    - list: A list containing the following elements:
-      - text (str): The response text from the OpenAI assistant.
-      - files (list): A list of files sent along with the response.
-      - status (int): The status code of the response. 0 indicates success, while any other value indicates an error.
+    - result (dict, optional): A dictionary filled once the run ends with the following keys:
+      - status (str): The final status of the run ('completed', 'failed', 'expired', 'cancelled' or 'incomplete').
+      - cost (float): The cost of the run in USD.
       - thread_id (str): The ID of the thread the prompt was sent to.
+
+    Yields:
+    - str: The pieces of the response text, with file citations removed.
     """
-    
-    cost = 0
+    if result is None:
+        result = {}
+    result.update({'status': None, 'cost': 0, 'thread_id': thread_id})
     tool_resources = {
         'file_search': {
             'vector_stores': [{'file_ids': file_ids}]
@@ -61,25 +63,55 @@ def run_OpenAI_assistant(assistant_id, prompt, model='gpt-4o-mini', role='user',
 
     if thread_id is None:
        thread_id = create_OpenAI_thread(tool_resources=tool_resources).id
+       result['thread_id'] = thread_id
 
     create_OpenAI_message(thread_id=thread_id, prompt=prompt, role=role, file_ids=file_ids, metadata=metadata)
 
-    run = {'status': None}
-    run = run_OpenAI_thread(thread_id=thread_id, assistant_id=assistant_id, model=model)
-
-    run = retrieve_OpenAI_run(thread_id=thread_id, run_id=run.id)
-    while run.status not in ['completed', 'failed', 'expired', 'cancelled']:
-        if run.status in ['queued', 'in_progress', 'cancelling']:
-            time.sleep(0.5)
-            run = retrieve_OpenAI_run(thread_id=thread_id, run_id=run.id)
-      
-    if run.status == 'completed':
-        cost = cost + calculate_cost(run.usage, session_id)
-        raw_response = retreive_OpenAI_messages(thread_id=thread_id, limit=1)
-        text = extract_content(message = raw_response.data[0])
-        response = [text, cost, thread_id]
-
-    if run.status in ['failed', 'expired', 'cancelled']:
-        response = [run.status, cost, thread_id]
-
-    return response
\ No newline at end of file
+    stream = run_OpenAI_thread(thread_id=thread_id, assistant_id=assistant_id, model=model, stream=True)
+    with stream:
+        for event in stream:
+            if event.event == 'thread.message.delta':
+                for content in event.data.delta.content or []:
+                    if content.type != 'text' or content.text is None or not content.text.value:
+                        continue
+                    text = content.text.value
+                    for annotation in content.text.annotations or []:
+                        if getattr(annotation, 'text', None):
+                            text = text.replace(annotation.text, '')
+                    if text:
+                        yield text
+            elif event.event == 'thread.run.completed':
+                result['status'] = 'completed'
+                result['cost'] = calculate_cost(event.data.usage, session_id)
+            elif event.event in ['thread.run.failed', 'thread.run.expired', 'thread.run.cancelled', 'thread.run.incomplete']:
+                result['status'] = event.data.status
+
+def run_OpenAI_assistant(assistant_id, prompt, model='gpt-4o-mini', role='user', file_ids=[], metadata=None, thread_id=None, session_id=None, page=None):
+    """
+    Runs the OpenAI assistant with the given parameters.
+
+    Args:
+    - assistant_id (str): The ID of the OpenAI assistant to run.
+    - prompt (str): The prompt to send to the OpenAI assistant.
+    - role (str, optional): The role of the user sending the prompt. Defaults to 'user'.
+    - file_ids (list, optional): A list of file IDs to send along with the prompt. Defaults to [].
+    - metadata (dict, optional): A dictionary of metadata to send along with the prompt. Defaults to None.
+    - thread_id (str, optional): The ID of the thread to send the prompt to. If None, a new thread will be created. Defaults to None.
+
+    Returns:
+    - list: A list containing the following elements:
+      - text (str): The response text from the OpenAI assistant, or the final status of the run if it did not complete.
+      - cost (float): The cost of the run in USD.
+      - thread_id (str): The ID of the thread the prompt was sent to.
+    """
+    result = {}
+    text = ''.join(stream_OpenAI_assistant(assistant_id=assistant_id, prompt=prompt, model=model, role=role, file_ids=file_ids,
+                                           metadata=metadata, thread_id=thread_id, session_id=session_id, page=page, result=result))
+
+    if result['status'] == 'completed':
+        if not text:
+            raw_response = retreive_OpenAI_messages(thread_id=result['thread_id'], limit=1)
+            text = extract_content(message = raw_response.data[0])
+        return [text, result['cost'], result['thread_id']]
+
+    return [result['status'] or 'failed', result['cost'], result['thread_id']]
@@ -0,0 +1,117 @@
+import os
+import re
+from embeddings import estimate_tokens
+from lexical_index import fuse_rankings
+from spec_chunker import format_chunk
+
+# Estimated tokens of chunk context sent with a question
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+# Chunks retrieved for a question before reranking and packing
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "10"))
+# Chunks the prompt used to be made of, reported as the baseline token count
+CONTEXT_BASELINE_CHUNKS = 5
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def _normalized_text(chunk):
+    return WHITESPACE_PATTERN.sub(" ", chunk['text']).strip().lower()
+
+
+def dedupe_chunks(chunk_ids, chunks):
+    """
+    Drop the chunks whose text repeats, or is contained in, the text of a better ranked chunk.
+
+    Args:
+    - chunk_ids (list): Chunk ids, best first.
+    - chunks (list): The chunks of the document.
+
+    Returns:
+    - list: The remaining chunk ids, in the same order.
+    """
+    kept = []
+    kept_texts = []
+    for chunk_id in dict.fromkeys(chunk_ids):
+        text = _normalized_text(chunks[chunk_id])
+        if any(text in kept_text for kept_text in kept_texts):
+            continue
+        kept.append(chunk_id)
+        kept_texts.append(text)
+    return kept
+
+
+def rerank_chunks(query, chunk_ids, lexical_index):
+    """
+    Rerank retrieved chunks by fusing their retrieval order with their BM25 score against the query.
+
+    Args:
+    - query (str): The question.
+    - chunk_ids (list): The retrieved chunk ids, best first.
+    - lexical_index (LexicalIndex): The lexical index of the document.
+
+    Returns:
+    - list: The chunk ids, best first.
+    """
+    scores = lexical_index.scores(query)
+    lexical_order = sorted((chunk_id for chunk_id in chunk_ids if chunk_id in scores), key=lambda i: -scores[i])
+    return fuse_rankings([chunk_ids, lexical_order], k=len(chunk_ids))
+
+
+def merge_adjacent_chunks(chunk_ids, chunks):
+    """
+    Merge chunks that follow each other in the same section into one, so they share a single source header.
+
+    Args:
+    - chunk_ids (list): Chunk ids.
+    - chunks (list): The chunks of the document.
+
+    Returns:
+    - list: The merged chunks, in document order, as dicts with the text, section and page of a chunk.
+    """
+    merged = []
+    previous_id = None
+    for chunk_id in sorted(chunk_ids):
+        chunk = chunks[chunk_id]
+        if merged and chunk_id == previous_id + 1 and chunk['section'] == merged[-1]['section']:
+            merged[-1]['text'] += "\n" + chunk['text']
+        else:
+            merged.append({'text': chunk['text'], 'section': chunk['section'], 'page': chunk['page']})
+        previous_id = chunk_id
+    return merged
+
+
+def assemble_context(query, chunk_ids, chunks, lexical_index, token_budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Turn retrieved chunks into the context of a question: dedupe, rerank, pack under a token budget, merge.
+
+    Chunks are taken best first while they fit in token_budget; the best one is always kept. The packed chunks are
+    then merged where adjacent and put back in document order.
+
+    Args:
+    - query (str): The question.
+    - chunk_ids (list): The retrieved chunk ids, best first.
+    - chunks (list): The chunks of the document.
+    - lexical_index (LexicalIndex): The lexical index of the document.
+    - token_budget (int, optional): The estimated token budget of the context. Defaults to CONTEXT_TOKEN_BUDGET.
+
+    Returns:
+    - dict: The context chunks (for get_openai_response), the ids of the chunks packed, the estimated tokens of
+      the context, and those of the first CONTEXT_BASELINE_CHUNKS retrieved chunks sent as they are.
+    """
+    candidates = rerank_chunks(query, dedupe_chunks(chunk_ids, chunks), lexical_index)
+    packed = []
+    tokens = 0
+    for chunk_id in candidates:
+        chunk_tokens = estimate_tokens(format_chunk(chunks[chunk_id]))
+        if packed and tokens + chunk_tokens > token_budget:
+            continue
+        packed.append(chunk_id)
+        tokens += chunk_tokens
+    context_chunks = merge_adjacent_chunks(packed, chunks)
+    baseline = [format_chunk(chunks[chunk_id]) for chunk_id in chunk_ids[:CONTEXT_BASELINE_CHUNKS]]
+    return {
+        'chunks': context_chunks,
+        'chunk_ids': packed,
+        'tokens': estimate_tokens("\n\n".join(format_chunk(chunk) for chunk in context_chunks)),
+        'baseline_tokens': estimate_tokens("\n\n".join(baseline)),
+    }
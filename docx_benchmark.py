@@ -0,0 +1,126 @@
+import sys
+import time
+from io import BytesIO
+
+from docx_report import write_docx_reports
+
+SECTION_COUNT = 400
+ITEM_LINE = "A. Product Data: For each type of product, include construction details, material descriptions and finishes."
+
+
+def synthetic_records(section_count=SECTION_COUNT):
+    """
+    Make submittal records shaped like those of a large project.
+
+    Args:
+    - section_count (int, optional): The number of records. Defaults to SECTION_COUNT.
+
+    Returns:
+    - list: The records, the first one being the master section.
+    """
+    records = []
+    for i in range(section_count):
+        content = "\n".join(["ACTION SUBMITTALS", *[ITEM_LINE] * 12, "", "CLOSEOUT SUBMITTALS", *[ITEM_LINE] * 4])
+        records.append({
+            'section_number': f"{i // 100:02d} {i % 100:02d} 00",
+            'section_name': f"SECTION NAME {i}",
+            'heading': f"SECTION {i // 100:02d} {i % 100:02d} 00 - SECTION NAME {i}",
+            'content': content * (5 if i == 0 else 1),
+            'master': i == 0,
+        })
+    return records
+
+
+def add_heading_with_page_break(doc, heading_text):
+    """
+    Add a page break, then a bold centered level 1 heading, as the python-docx builder did for each section.
+
+    Args:
+    - doc (docx.document.Document): The document.
+    - heading_text (str): The heading text.
+    """
+    from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+    doc.add_page_break()
+    heading = doc.add_heading(level=1)
+    run = heading.add_run(heading_text)
+    run.bold = True
+    heading.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+
+def write_docx_reports_python_docx(project_name, records, output, toc_output):
+    """
+    Write the submittals DOCX and the TOC DOCX through python-docx's object layer, the way the pipeline used to.
+
+    Args:
+    - project_name (str): The name of the project.
+    - records (list): The submittal records.
+    - output (file-like): The binary file object of the submittals DOCX.
+    - toc_output (file-like): The binary file object of the TOC DOCX.
+    """
+    from docx import Document
+    from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+    from docx.oxml.ns import qn
+    from docx.oxml import OxmlElement
+
+    doc = Document()
+    doc.add_heading(project_name, level=1).alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    doc.add_heading('EXTRACTED SUBMITTALS', level=1).alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    run = doc.add_paragraph().add_run()
+    for field_type, instruction in [('begin', None), (None, r'TOC \o "1-3" \h \z \u'), ('separate', None), ('end', None)]:
+        if instruction:
+            element = OxmlElement('w:instrText')
+            element.set(qn('xml:space'), 'preserve')
+            element.text = instruction
+        else:
+            element = OxmlElement('w:fldChar')
+            element.set(qn('w:fldCharType'), field_type)
+        run._r.append(element)
+    for record in records:
+        add_heading_with_page_break(doc, record['heading'])
+        doc.add_paragraph(record['content'])
+    doc.save(output)
+
+    toc_doc = Document()
+    toc_doc.add_heading('Table of Contents', level=1).alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    for record in records:
+        if not record['master']:
+            toc_doc.add_paragraph().add_run(record['heading'])
+    toc_doc.save(toc_output)
+
+
+def paragraph_texts(docx_bytes):
+    """
+    Read back the paragraph texts and styles of a DOCX, to compare the two builders.
+
+    Args:
+    - docx_bytes (bytes): The DOCX package.
+
+    Returns:
+    - list: (style name, alignment, text) of every paragraph.
+    """
+    from docx import Document
+    return [(p.style.name, p.alignment, p.text) for p in Document(BytesIO(docx_bytes)).paragraphs]
+
+
+def main():
+    records = synthetic_records()
+    timings = {}
+    outputs = {}
+    for name, build in [("python-docx", write_docx_reports_python_docx), ("docx_report", write_docx_reports)]:
+        output, toc_output = BytesIO(), BytesIO()
+        start = time.perf_counter()
+        build("Benchmark Project", records, output, toc_output)
+        timings[name] = time.perf_counter() - start
+        outputs[name] = (output.getvalue(), toc_output.getvalue())
+        print(f"{name:12s} {timings[name]:7.3f} s  {len(outputs[name][0]) / 1024:8.0f} KB")
+
+    print(f"Speedup: {timings['python-docx'] / timings['docx_report']:.1f}x on {len(records)} sections")
+    for document, (expected, actual) in zip(["submittals", "TOC"], zip(*outputs.values())):
+        if paragraph_texts(expected) != paragraph_texts(actual):
+            print(f"FAIL: the {document} documents differ")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
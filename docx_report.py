@@ -0,0 +1,119 @@
+import os
+import re
+import zipfile
+import importlib.util
+from xml.sax.saxutils import escape
+
+DOCUMENT_PART = "word/document.xml"
+
+# Characters XML 1.0 does not allow; PDF text extraction produces some of them (form feeds, control codes)
+XML_INVALID_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+PAGE_BREAK_XML = '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+TOC_FIELD_XML = (
+    '<w:p><w:r><w:fldChar w:fldCharType="begin"/>'
+    '<w:instrText xml:space="preserve">TOC \\o "1-3" \\h \\z \\u</w:instrText>'
+    '<w:fldChar w:fldCharType="separate"/><w:fldChar w:fldCharType="end"/></w:r></w:p>'
+)
+
+_template_parts = None
+
+
+def docx_template_path():
+    """
+    Locate the package python-docx starts every new Document() from, without importing python-docx.
+
+    Its styles, numbering and settings parts are reused as they are.
+
+    Returns:
+    - str: The path of the template DOCX.
+    """
+    return os.path.join(importlib.util.find_spec("docx").submodule_search_locations[0], "templates", "default.docx")
+
+
+def _load_template():
+    global _template_parts
+    if _template_parts is None:
+        with zipfile.ZipFile(docx_template_path()) as template:
+            _template_parts = [(info, template.read(info.filename)) for info in template.infolist()]
+    return _template_parts
+
+
+def _text_xml(text):
+    # Line breaks and tabs become <w:br/> and <w:tab/> elements of the run, as with python-docx's add_paragraph(text)
+    text = escape(XML_INVALID_CHARS.sub('', text))
+    text = text.replace('\n', '</w:t><w:br/><w:t xml:space="preserve">')
+    text = text.replace('\t', '</w:t><w:tab/><w:t xml:space="preserve">')
+    return f'<w:t xml:space="preserve">{text}</w:t>'
+
+
+def heading_xml(text, bold=False):
+    """
+    Render a centered level 1 heading paragraph.
+
+    Args:
+    - text (str): The heading text.
+    - bold (bool, optional): Whether the run is bold. Defaults to False.
+
+    Returns:
+    - str: The <w:p> element.
+    """
+    run_properties = '<w:rPr><w:b/></w:rPr>' if bold else ''
+    return (f'<w:p><w:pPr><w:pStyle w:val="Heading1"/><w:jc w:val="center"/></w:pPr>'
+            f'<w:r>{run_properties}{_text_xml(text)}</w:r></w:p>')
+
+
+def paragraph_xml(text):
+    """
+    Render a body paragraph.
+
+    Args:
+    - text (str): The paragraph text; line breaks and tabs are kept.
+
+    Returns:
+    - str: The <w:p> element.
+    """
+    return f'<w:p><w:r>{_text_xml(text)}</w:r></w:p>'
+
+
+def write_docx(body_fragments, output):
+    """
+    Write a DOCX package from the python-docx template with the given body content.
+
+    Args:
+    - body_fragments (list): The XML of the body elements, in order.
+    - output (str or file-like): The path or binary file object to write to.
+    """
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as package:
+        for info, data in _load_template():
+            if info.filename == DOCUMENT_PART:
+                document_xml = data.decode("utf-8")
+                body_end = document_xml.rindex("<w:sectPr")
+                data = "".join([document_xml[:body_end], *body_fragments, document_xml[body_end:]]).encode("utf-8")
+            package.writestr(info.filename, data)
+
+
+def write_docx_reports(project_name, records, output, toc_output):
+    """
+    Write the submittals DOCX and the TOC DOCX in one pass over the submittal records.
+
+    The documents are the ones the python-docx builder produced: the project title page with a TOC field, then a
+    page per section with its heading and content, and a table of contents listing the non-master sections. The
+    body XML is rendered directly rather than through python-docx's object layer.
+
+    Args:
+    - project_name (str): The name of the project.
+    - records (list): The submittal records, see submittals_pipeline.iter_submittal_records.
+    - output (str or file-like): The path or binary file object of the submittals DOCX.
+    - toc_output (str or file-like): The path or binary file object of the TOC DOCX.
+    """
+    body = [heading_xml(project_name), heading_xml('EXTRACTED SUBMITTALS'), TOC_FIELD_XML]
+    toc_body = [heading_xml('Table of Contents')]
+    for record in records:
+        body.append(PAGE_BREAK_XML)
+        body.append(heading_xml(record['heading'], bold=True))
+        body.append(paragraph_xml(record['content']))
+        if not record['master']:
+            toc_body.append(paragraph_xml(record['heading']))
+    write_docx(body, output)
+    write_docx(toc_body, toc_output)
@@ -0,0 +1,157 @@
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+# Directory holding the SQLite key index and one embedding matrix file per model and storage type
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", ".embedding_store")
+# Storage type of the matrices; float16 halves the disk and page cache footprint at a negligible recall cost
+EMBEDDING_STORE_DTYPE = os.getenv("EMBEDDING_STORE_DTYPE", "float32")
+# SQLite limits the number of bound parameters of a statement
+_LOOKUP_BATCH_SIZE = 500
+
+
+def hash_text(text):
+    """
+    Compute the key of a chunk of text in the embedding store.
+
+    Args:
+    - text (str): The chunk of text.
+
+    Returns:
+    - bytes: The SHA-256 digest of the UTF-8 encoded text.
+    """
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingStore:
+    """
+    Persistent embedding cache keyed by (model name, storage type, SHA-256 of the chunk text).
+
+    The vectors of each model and storage type are appended to a flat matrix file that is memory-mapped for reads,
+    and a small SQLite database maps every key to its row. Writers from several threads or processes are serialized
+    by an immediate SQLite transaction, which also guards the row count of each matrix file.
+
+    Args:
+    - directory (str, optional): The directory of the store. Defaults to EMBEDDING_STORE_DIR.
+    - dtype (str, optional): The storage type of the matrices, float32 or float16. Defaults to EMBEDDING_STORE_DTYPE.
+    """
+
+    def __init__(self, directory=EMBEDDING_STORE_DIR, dtype=EMBEDDING_STORE_DTYPE):
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(os.path.join(directory, "index.sqlite"), timeout=60,
+                                           check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            columns = [column[1] for column in self._connection.execute("PRAGMA table_info(matrices)")]
+            if columns and "dtype" not in columns:
+                # Stores written before the storage type was part of the key cannot tell which matrix file their
+                # rows point into; they are emptied and their embeddings are computed again
+                self._connection.execute("DROP TABLE matrices")
+                self._connection.execute("DROP TABLE IF EXISTS embeddings")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS matrices (model TEXT NOT NULL, dtype TEXT NOT NULL, dim INTEGER NOT NULL, "
+                "rows INTEGER NOT NULL, PRIMARY KEY (model, dtype))")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (model TEXT NOT NULL, dtype TEXT NOT NULL, "
+                "text_hash BLOB NOT NULL, row INTEGER NOT NULL, PRIMARY KEY (model, dtype, text_hash)) WITHOUT ROWID")
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+
+    def _matrix_path(self, model):
+        return os.path.join(self.directory, f"{re.sub(r'[^A-Za-z0-9_.-]', '_', model)}.{self.dtype.name}")
+
+    def lookup(self, model, text_hashes):
+        """
+        Look up stored embeddings.
+
+        Args:
+        - model (str): The embedding model.
+        - text_hashes (list): The keys of the texts, see hash_text.
+
+        Returns:
+        - tuple: A float32 array with one row per key (None when nothing was found) and the list of the indices
+          of the keys that were not found.
+        """
+        with self._lock:
+            matrix_row = self._connection.execute("SELECT dim, rows FROM matrices WHERE model = ? AND dtype = ?",
+                                                  (model, self.dtype.name)).fetchone()
+            if matrix_row is None or not text_hashes:
+                return None, list(range(len(text_hashes)))
+            rows = {}
+            unique_hashes = list(set(text_hashes))
+            for i in range(0, len(unique_hashes), _LOOKUP_BATCH_SIZE):
+                batch = unique_hashes[i:i + _LOOKUP_BATCH_SIZE]
+                rows.update(self._connection.execute(
+                    f"SELECT text_hash, row FROM embeddings WHERE model = ? AND dtype = ? "
+                    f"AND text_hash IN ({','.join('?' * len(batch))})",
+                    [model, self.dtype.name, *batch]).fetchall())
+
+        dim, row_count = matrix_row
+        found = [i for i, text_hash in enumerate(text_hashes) if text_hash in rows]
+        missing = [i for i, text_hash in enumerate(text_hashes) if text_hash not in rows]
+        embeddings = np.zeros((len(text_hashes), dim), dtype=np.float32)
+        if found:
+            matrix = np.memmap(self._matrix_path(model), dtype=self.dtype, mode="r", shape=(row_count, dim))
+            embeddings[found] = matrix[[rows[text_hashes[i]] for i in found]]
+        return embeddings, missing
+
+    def add(self, model, text_hashes, embeddings):
+        """
+        Append embeddings to the store. Keys that are already stored are skipped.
+
+        Args:
+        - model (str): The embedding model.
+        - text_hashes (list): The keys of the texts, see hash_text.
+        - embeddings (numpy.ndarray): The embeddings, one row per key.
+        """
+        if not text_hashes:
+            return
+        embeddings = np.ascontiguousarray(embeddings, dtype=self.dtype)
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                stored = set()
+                for i in range(0, len(text_hashes), _LOOKUP_BATCH_SIZE):
+                    batch = text_hashes[i:i + _LOOKUP_BATCH_SIZE]
+                    stored.update(text_hash for (text_hash,) in self._connection.execute(
+                        f"SELECT text_hash FROM embeddings WHERE model = ? AND dtype = ? "
+                        f"AND text_hash IN ({','.join('?' * len(batch))})",
+                        [model, self.dtype.name, *batch]))
+                new_rows = {}
+                for i, text_hash in enumerate(text_hashes):
+                    if text_hash not in stored and text_hash not in new_rows:
+                        new_rows[text_hash] = i
+                if not new_rows:
+                    self._connection.execute("COMMIT")
+                    return
+
+                matrix_row = self._connection.execute("SELECT dim, rows FROM matrices WHERE model = ? AND dtype = ?",
+                                                      (model, self.dtype.name)).fetchone()
+                dim, row_count = matrix_row if matrix_row else (embeddings.shape[1], 0)
+                if dim != embeddings.shape[1]:
+                    raise ValueError(f"Embeddings of {model} have {dim} dimensions, got {embeddings.shape[1]}")
+
+                # Rows past the recorded count belong to an interrupted write and are overwritten
+                with open(self._matrix_path(model), "r+b" if matrix_row else "wb") as f:
+                    f.seek(row_count * dim * self.dtype.itemsize)
+                    f.write(embeddings[list(new_rows.values())].tobytes())
+                    f.truncate()
+                self._connection.executemany(
+                    "INSERT INTO embeddings (model, dtype, text_hash, row) VALUES (?, ?, ?, ?)",
+                    [(model, self.dtype.name, text_hash, row_count + j) for j, text_hash in enumerate(new_rows)])
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO matrices (model, dtype, dim, rows) VALUES (?, ?, ?, ?)",
+                    (model, self.dtype.name, dim, row_count + len(new_rows)))
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
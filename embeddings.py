@@ -0,0 +1,135 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from open_ai_api_calls import create_OpenAI_embeddings
+from embedding_store import EmbeddingStore, hash_text
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+# Estimated tokens packed into one embeddings request
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "100000"))
+# The embeddings endpoint accepts at most 2048 inputs per request
+EMBEDDING_BATCH_SIZE = 2048
+# Number of embeddings requests in flight at once
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "4"))
+
+_embedding_store = None
+
+
+def estimate_tokens(text):
+    """
+    Estimate the number of tokens of a text without loading a tokenizer.
+
+    English spec text averages about four characters per token; three is used to stay on the safe side.
+
+    Args:
+    - text (str): The text to measure.
+
+    Returns:
+    - int: The estimated token count.
+    """
+    return len(text) // 3 + 1
+
+
+def batch_texts(texts, max_batch_tokens=EMBEDDING_BATCH_TOKENS, max_batch_size=EMBEDDING_BATCH_SIZE):
+    """
+    Pack consecutive texts into batches under a token budget and an input count limit.
+
+    Args:
+    - texts (list): The texts to pack.
+    - max_batch_tokens (int, optional): The estimated token budget of a batch. Defaults to EMBEDDING_BATCH_TOKENS.
+    - max_batch_size (int, optional): The maximum number of texts in a batch. Defaults to EMBEDDING_BATCH_SIZE.
+
+    Returns:
+    - list: (start, stop) index ranges into texts, in order.
+    """
+    batches = []
+    start = 0
+    batch_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if i > start and (batch_tokens + tokens > max_batch_tokens or i - start >= max_batch_size):
+            batches.append((start, i))
+            start = i
+            batch_tokens = 0
+        batch_tokens += tokens
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+def embed_texts(texts, model=EMBEDDING_MODEL, max_batch_tokens=EMBEDDING_BATCH_TOKENS, max_workers=EMBEDDING_WORKERS):
+    """
+    Embed a list of texts with batched requests sent concurrently.
+
+    Args:
+    - texts (list): The texts to embed.
+    - model (str, optional): The embedding model. Defaults to EMBEDDING_MODEL.
+    - max_batch_tokens (int, optional): The estimated token budget of a request. Defaults to EMBEDDING_BATCH_TOKENS.
+    - max_workers (int, optional): The number of concurrent requests. Defaults to EMBEDDING_WORKERS.
+
+    Returns:
+    - numpy.ndarray: A contiguous float32 array with one row per text, in input order.
+    """
+    batches = batch_texts(texts, max_batch_tokens)
+    embeddings = None
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(create_OpenAI_embeddings, texts[start:stop], model): (start, stop)
+                   for start, stop in batches}
+        try:
+            for future in as_completed(futures):
+                start, stop = futures[future]
+                data = future.result().data
+                if embeddings is None:
+                    embeddings = np.empty((len(texts), len(data[0].embedding)), dtype=np.float32)
+                for item in data:
+                    embeddings[start + item.index] = item.embedding
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    if embeddings is None:
+        return np.empty((0, 0), dtype=np.float32)
+    return embeddings
+
+
+def get_embedding_store():
+    """
+    Return the process-wide embedding store, opening it on first use.
+
+    Returns:
+    - EmbeddingStore: The shared store.
+    """
+    global _embedding_store
+    if _embedding_store is None:
+        _embedding_store = EmbeddingStore()
+    return _embedding_store
+
+
+def embed_texts_cached(texts, model=EMBEDDING_MODEL, store=None):
+    """
+    Embed a list of texts, only sending the texts missing from the embedding store to the API.
+
+    Args:
+    - texts (list): The texts to embed.
+    - model (str, optional): The embedding model. Defaults to EMBEDDING_MODEL.
+    - store (EmbeddingStore, optional): The embedding store. Defaults to the process-wide store.
+
+    Returns:
+    - numpy.ndarray: A contiguous float32 array with one row per text, in input order.
+    """
+    store = store or get_embedding_store()
+    text_hashes = [hash_text(text) for text in texts]
+    embeddings, missing = store.lookup(model, text_hashes)
+    if not missing:
+        return embeddings if embeddings is not None else np.empty((0, 0), dtype=np.float32)
+
+    # Identical chunks (repeated boilerplate) are only embedded once
+    unique_missing = list({text_hashes[i]: i for i in missing}.values())
+    new_embeddings = embed_texts([texts[i] for i in unique_missing], model)
+    store.add(model, [text_hashes[i] for i in unique_missing], new_embeddings)
+    if embeddings is None:
+        embeddings = np.empty((len(texts), new_embeddings.shape[1]), dtype=np.float32)
+    rows = {text_hashes[i]: row for row, i in enumerate(unique_missing)}
+    for i in missing:
+        embeddings[i] = new_embeddings[rows[text_hashes[i]]]
+    return embeddings
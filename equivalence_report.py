@@ -0,0 +1,179 @@
+import re
+import sys
+import random
+
+from submittals_pipeline import extract_section, extract_submittals_subsection, find_addons
+
+# Randomized cases generated per function; the run is reproducible for a given seed
+CASES = 2000
+SEED = 0
+
+WORDS = ("contractor shall submit product data shop drawings samples for each type of material "
+         "include details finishes warranty installation requirements coordinate with work").split()
+NAMES = ["SUBMITTAL PROCEDURES", "PANELBOARDS", "UNDERCARPET CABLES", "LOW-VOLTAGE CONDUCTORS", "PAINTING"]
+SUBMITTAL_TYPES = ["SUBMITTALS", "ACTION SUBMITTALS", "INFORMATIONAL SUBMITTALS", "CLOSEOUT SUBMITTALS",
+                   "SHOP DRAWING SUBMITTALS"]
+TOC_SEPARATORS = [" ", "  ", " - ", "\t"]
+OTHER_ARTICLES = ["SUMMARY", "REFERENCES", "QUALITY ASSURANCE", "WARRANTY", "PRODUCTS", "EXECUTION"]
+
+
+# The implementations the single-pass versions replaced, kept as the reference they are checked against
+def baseline_find_addons(text, section_numbers):
+    addons = []
+    for section in section_numbers:
+        addon_pattern = re.compile(rf'{re.escape(section)}\.\d{{2}}')
+        addons.extend(addon_pattern.findall(text))
+    return addons
+
+
+def baseline_extract_section(text, section_heading):
+    pattern = re.compile(rf'({section_heading}\s+.*?END OF SECTION)', re.DOTALL)
+    match = pattern.search(text)
+    if match:
+        name_pattern = re.compile(rf'{section_heading}\s+(.*?)\n')
+        name_match = name_pattern.search(match.group(1))
+        section_name = name_match.group(1) if name_match else 'Unknown'
+        return match.group(1), section_name
+    return None, None
+
+
+def baseline_extract_submittals_subsection(text, submittal_types=SUBMITTAL_TYPES):
+    submittals = []
+    for submittal_type in submittal_types:
+        pattern = re.compile(rf'({submittal_type}.*?)(?=\n\d+\.\d+|\Z)', re.DOTALL)
+        match = pattern.search(text)
+        if match:
+            submittals.append(match.group(1))
+    return "\n\n".join(submittals) if submittals else None
+
+
+def random_section_number(rng):
+    """
+    Make a section number in one of the forms spec books use, sometimes with an addon suffix.
+
+    Args:
+    - rng (random.Random): The random generator.
+
+    Returns:
+    - str: The section number.
+    """
+    digits = [rng.choice(["01", "02", "09", "22", "26", "33"]), f"{rng.randrange(100):02d}", f"{rng.randrange(100):02d}"]
+    number = rng.choice([" ".join(digits), "".join(digits), digits[0] + " " + digits[1], digits[0][1] + digits[1]])
+    if rng.random() < 0.3:
+        number += f".{rng.randrange(100):02d}"
+    return number
+
+
+def random_words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def random_toc(rng):
+    """
+    Make the text of table of contents pages and the section numbers read from it.
+
+    Returns:
+    - tuple: The text and the section numbers, some repeated, prefixes of others or absent from the text.
+    """
+    numbers = [random_section_number(rng) for _ in range(rng.randrange(1, 12))]
+    lines = [number + rng.choice(TOC_SEPARATORS) + rng.choice(NAMES) for number in numbers]
+    section_numbers = [number.split(".")[0] for number in numbers]
+    section_numbers += rng.sample(section_numbers, min(2, len(section_numbers)))
+    section_numbers += [number[:5] for number in rng.sample(numbers, min(2, len(numbers)))]
+    section_numbers.append(random_section_number(rng).split(".")[0])
+    rng.shuffle(section_numbers)
+    return "\n".join(lines), section_numbers
+
+
+def random_spec(rng):
+    """
+    Make the text of a spec book and the section headings looked up in it.
+
+    Sections are headed "SECTION <number>" (addon numbers and "NNN -" forms included), may be cited in the body of
+    other sections, and end with END OF SECTION.
+
+    Returns:
+    - tuple: The text and the headings, including prefixes of the section numbers and numbers absent from the text.
+    """
+    numbers = [random_section_number(rng) for _ in range(rng.randrange(1, 8))]
+    if rng.random() < 0.2:
+        numbers.append(f"{rng.randrange(1000):03d} -")
+    parts = []
+    for number in numbers:
+        body = [random_words(rng, rng.randrange(3, 12)) for _ in range(rng.randrange(1, 5))]
+        if rng.random() < 0.3:
+            body.insert(rng.randrange(len(body) + 1), f"comply with SECTION {rng.choice(numbers)} requirements")
+        parts.append("\n".join([f"SECTION {number}", rng.choice(NAMES), *body, f"END OF SECTION {number}", ""]))
+    headings = [f"SECTION {number}" for number in numbers]
+    headings += [f"SECTION {number.split()[0]}" for number in numbers]
+    headings.append(f"SECTION {random_section_number(rng)}")
+    return "".join(parts), headings
+
+
+def random_section(rng):
+    """
+    Make the text of a section with one submittal article among other numbered articles.
+
+    Returns:
+    - tuple: The text and the heading type of its submittal article.
+    """
+    submittal_type = rng.choice(SUBMITTAL_TYPES)
+    articles = rng.sample(OTHER_ARTICLES, rng.randrange(0, 4))
+    articles.insert(rng.randrange(len(articles) + 1), submittal_type)
+    lines = ["SECTION 26 24 16", "PANELBOARDS", "PART 1 - GENERAL"]
+    for i, article in enumerate(articles, start=1):
+        lines.append(f"1.{i} {article}" if article not in SUBMITTAL_TYPES or rng.random() < 0.7 else article)
+        for letter in "ABCD"[:rng.randrange(1, 5)]:
+            lines.append(f"{letter}. {random_words(rng, rng.randrange(3, 10)).capitalize()}.")
+            if rng.random() < 0.3:
+                lines.append(f"{rng.randrange(1, 4)}. {random_words(rng, 5)}.")
+    if rng.random() < 0.5:
+        lines.append("END OF SECTION 26 24 16")
+    return "\n".join(lines), submittal_type
+
+
+def compare_find_addons(rng):
+    text, section_numbers = random_toc(rng)
+    return (text, section_numbers), baseline_find_addons(text, section_numbers), find_addons(text, section_numbers)
+
+
+def compare_extract_section(rng):
+    text, headings = random_spec(rng)
+    expected = [baseline_extract_section(text, heading) for heading in headings]
+    return (text, headings), expected, [extract_section(text, heading) for heading in headings]
+
+
+def compare_submittals_subsection(rng):
+    # The previous implementation also matched "SUBMITTALS" inside "ACTION SUBMITTALS" and exported the article a
+    # second time; that overlap was dropped on purpose, so only the type actually heading the article is compared
+    text, submittal_type = random_section(rng)
+    expected = baseline_extract_submittals_subsection(text, [submittal_type])
+    return text, expected, extract_submittals_subsection(text)
+
+
+COMPARISONS = {
+    "find_addons": compare_find_addons,
+    "extract_section": compare_extract_section,
+    "extract_submittals_subsection": compare_submittals_subsection,
+}
+
+
+def main(cases=CASES, seed=SEED):
+    failed = False
+    for name, compare in COMPARISONS.items():
+        rng = random.Random(seed)
+        mismatches = []
+        for _ in range(cases):
+            case, expected, actual = compare(rng)
+            if expected != actual:
+                mismatches.append((case, expected, actual))
+        print(f"{name}: {cases - len(mismatches)}/{cases} cases match the previous implementation")
+        if mismatches:
+            failed = True
+            case, expected, actual = mismatches[0]
+            print(f"FAIL: first mismatch\n  input:    {case!r}\n  expected: {expected!r}\n  actual:   {actual!r}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
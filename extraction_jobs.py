@@ -0,0 +1,147 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of extraction jobs running at once in this process; further jobs wait in the queue
+EXTRACTION_JOB_WORKERS = int(os.getenv("EXTRACTION_JOB_WORKERS", "2"))
+# Finished jobs nobody collected (closed browser tabs) are forgotten after this many seconds
+FINISHED_JOB_TTL_S = 3600
+
+
+class JobCancelled(Exception):
+    """Raised inside a job at its next progress report once its cancellation was requested."""
+
+
+class ExtractionJob:
+    """
+    State of a background job, shared between the worker thread and the Streamlit script runs polling it.
+
+    Attributes:
+    - job_id (str): The identifier of the job, kept in st.session_state.
+    - status (str): queued, running, done, failed or cancelled.
+    - progress (dict): The (done, total) counts reported for each stage of the job.
+    - result: The return value of the job function once it is done.
+    - error (BaseException): The exception raised by the job function if it failed.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.status = "queued"
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.finished_at = None
+        self._cancel_requested = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    def report_progress(self, stage, done, total):
+        """
+        Record the progress of a stage. Passed to the job function as its progress callback.
+
+        Args:
+        - stage (str): The name of the stage.
+        - done (int): The number of units of work done.
+        - total (int): The total number of units of work of the stage.
+
+        Raises:
+        - JobCancelled: If the cancellation of the job was requested.
+        """
+        if self._cancel_requested.is_set():
+            raise JobCancelled(self.job_id)
+        self.progress[stage] = (done, total)
+
+    def cancel(self):
+        """Request the cancellation of the job. A running job stops at its next progress report."""
+        self._cancel_requested.set()
+
+
+_executor = ThreadPoolExecutor(max_workers=EXTRACTION_JOB_WORKERS, thread_name_prefix="extraction-job")
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def _run_job(job, fn, args, kwargs):
+    try:
+        if job._cancel_requested.is_set():
+            raise JobCancelled(job.job_id)
+        job.status = "running"
+        job.result = fn(*args, progress=job.report_progress, **kwargs)
+        job.status = "done"
+    except JobCancelled:
+        job.status = "cancelled"
+    except BaseException as e:
+        job.error = e
+        job.status = "failed"
+    finally:
+        job.finished_at = time.monotonic()
+
+
+def _forget_stale_jobs():
+    now = time.monotonic()
+    with _jobs_lock:
+        for job_id in [job_id for job_id, job in _jobs.items()
+                       if job.finished and now - job.finished_at > FINISHED_JOB_TTL_S]:
+            del _jobs[job_id]
+
+
+def submit_job(fn, *args, **kwargs):
+    """
+    Queue a function on the bounded job executor.
+
+    Args:
+    - fn (callable): The job function. It is called with the given arguments and a progress keyword argument,
+      see ExtractionJob.report_progress.
+    - *args: The positional arguments of fn.
+    - **kwargs: The keyword arguments of fn.
+
+    Returns:
+    - str: The ID of the job.
+    """
+    _forget_stale_jobs()
+    job = ExtractionJob(uuid.uuid4().hex)
+    with _jobs_lock:
+        _jobs[job.job_id] = job
+    _executor.submit(_run_job, job, fn, args, kwargs)
+    return job.job_id
+
+
+def get_job(job_id):
+    """
+    Look up a job.
+
+    Args:
+    - job_id (str): The ID returned by submit_job.
+
+    Returns:
+    - ExtractionJob or None: The job, or None if it is unknown (forgotten, or submitted by another process).
+    """
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def cancel_job(job_id):
+    """
+    Request the cancellation of a job.
+
+    Args:
+    - job_id (str): The ID returned by submit_job.
+    """
+    job = get_job(job_id)
+    if job is not None:
+        job.cancel()
+
+
+def forget_job(job_id):
+    """
+    Drop a finished job once its result has been collected.
+
+    Args:
+    - job_id (str): The ID returned by submit_job.
+    """
+    with _jobs_lock:
+        _jobs.pop(job_id, None)
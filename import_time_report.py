@@ -0,0 +1,77 @@
+import os
+import re
+import ast
+import sys
+import subprocess
+
+# Import time the page may add on top of Streamlit itself before its first paint
+IMPORT_TIME_BUDGET_S = float(os.getenv("IMPORT_TIME_BUDGET_S", "1.0"))
+PAGE_MODULE = "submittalswebpage"
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def profile_imports(code):
+    """
+    Profile the imports of a Python snippet with -X importtime in a fresh interpreter.
+
+    Args:
+    - code (str): The code to run.
+
+    Returns:
+    - dict: The self and cumulative import times in microseconds of every module imported, keyed by module name.
+    """
+    # The background import warm-up would otherwise hide eager imports from the profile
+    env = dict(os.environ, SUBMITTALS_FAST_START="0")
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                               env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode != 0:
+        raise RuntimeError(f"Profiling {code!r} failed:\n{completed.stderr}")
+    timings = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            timings[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return timings
+
+
+def heavy_modules():
+    """
+    Read the list of heavy dependencies the page must import lazily.
+
+    The list is parsed from the page source rather than imported, since importing the page runs it.
+
+    Returns:
+    - list: The module names.
+    """
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{PAGE_MODULE}.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(target, "id", None) == "HEAVY_MODULES" for target in node.targets):
+            return ast.literal_eval(node.value)
+    return []
+
+
+def main():
+    baseline = profile_imports("import streamlit")
+    page = profile_imports(f"import {PAGE_MODULE}")
+    page_only = {name: timing for name, timing in page.items() if name not in baseline}
+    total_s = sum(self_us for self_us, _ in page_only.values()) / 1e6
+
+    print(f"Modules imported by {PAGE_MODULE} on top of streamlit: {len(page_only)}, {total_s:.3f} s")
+    for name, (self_us, cumulative_us) in sorted(page_only.items(), key=lambda item: -item[1][1])[:20]:
+        print(f"  {cumulative_us / 1000:9.1f} ms cumulative {self_us / 1000:9.1f} ms self  {name}")
+
+    eager_heavy = [name for name in heavy_modules() if name in page_only]
+    failed = False
+    if eager_heavy:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(eager_heavy)}")
+        failed = True
+    if total_s > IMPORT_TIME_BUDGET_S:
+        print(f"FAIL: startup imports take {total_s:.3f} s, over the {IMPORT_TIME_BUDGET_S:.3f} s budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
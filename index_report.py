@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+import numpy as np
+
+# Synthetic corpus the index types are compared on; the dimension of text-embedding-ada-002 by default
+REPORT_VECTORS = int(os.getenv("REPORT_VECTORS", "20000"))
+REPORT_DIMENSION = int(os.getenv("REPORT_DIMENSION", "1536"))
+# Spec book chunks are not spread uniformly: they gather around the topics of their sections
+REPORT_CLUSTERS = int(os.getenv("REPORT_CLUSTERS", "200"))
+REPORT_K = 5
+BACKENDS = ["flat", "hnsw", "ivfpq"]
+
+
+def synthetic_embeddings(vector_count, dimension, cluster_count, seed=0):
+    """
+    Make unit-length vectors gathered around random cluster centres, a stand-in for the embeddings of spec chunks.
+
+    Args:
+    - vector_count (int): The number of vectors.
+    - dimension (int): Their dimension.
+    - cluster_count (int): The number of clusters.
+    - seed (int, optional): The seed of the random generator. Defaults to 0.
+
+    Returns:
+    - numpy.ndarray: The float32 vectors, one per row.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((cluster_count, dimension), dtype=np.float32)
+    embeddings = centres[rng.integers(cluster_count, size=vector_count)]
+    embeddings += 0.5 * rng.standard_normal((vector_count, dimension), dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings
+
+
+def main():
+    from vector_index import build_index, choose_index_backend, index_report
+
+    embeddings = synthetic_embeddings(REPORT_VECTORS, REPORT_DIMENSION, REPORT_CLUSTERS)
+    print(f"Synthetic corpus: {REPORT_VECTORS} vectors of {REPORT_DIMENSION} dimensions in {REPORT_CLUSTERS} clusters, "
+          f"auto backend: {choose_index_backend(REPORT_VECTORS)}")
+    for backend in BACKENDS:
+        start = time.perf_counter()
+        index = build_index(embeddings, backend)
+        build_s = time.perf_counter() - start
+        report = index_report(index, embeddings, k=REPORT_K)
+        print(f"  {backend:6} {report['index_type']:14} recall@{REPORT_K} {report[f'recall@{REPORT_K}']:.3f}  "
+              f"{report['index_ms_per_query']:7.3f} ms/query (flat {report['flat_ms_per_query']:.3f})  "
+              f"built in {build_s:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
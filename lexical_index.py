@@ -0,0 +1,181 @@
+import os
+import re
+import math
+from collections import Counter, defaultdict
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Query terms at least this rare (inverse document frequency) are treated as exact lookups: product and
+# manufacturer names, model numbers
+RARE_TOKEN_IDF = float(os.getenv("RARE_TOKEN_IDF", "3.0"))
+# Reciprocal rank fusion constant; larger values flatten the difference between top and lower ranks
+RRF_K = 60
+# Candidates taken from each retriever before fusion
+FUSION_CANDIDATES = 20
+
+SECTION_NUMBER_TOKEN_PATTERN = re.compile(r'\b\d{2} ?\d{2} ?\d{2}\b|\b\d{5}\b')
+WORD_TOKEN_PATTERN = re.compile(r'[a-z0-9][a-z0-9\-]*[a-z0-9]|[a-z0-9]')
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it of on or should that the this to what when where which
+who why will with we our my me you your section sections spec specs specification specifications about
+""".split())
+
+
+def section_token(section_number):
+    """
+    Make the token a section number is indexed under, so "01 33 00", "013300" and the chunk section match.
+
+    Args:
+    - section_number (str): The section number.
+
+    Returns:
+    - str: The token.
+    """
+    return "section:" + re.sub(r'\D', '', section_number)
+
+
+def tokenize(text):
+    """
+    Split text into lowercase search tokens: a section token per section number, then the words.
+
+    Args:
+    - text (str): The text.
+
+    Returns:
+    - list: The tokens, stopwords removed.
+    """
+    tokens = [section_token(match.group(0)) for match in SECTION_NUMBER_TOKEN_PATTERN.finditer(text)]
+    text = SECTION_NUMBER_TOKEN_PATTERN.sub(' ', text).lower()
+    tokens.extend(token for token in WORD_TOKEN_PATTERN.findall(text) if token not in STOPWORDS)
+    return tokens
+
+
+class LexicalIndex:
+    """
+    In-memory BM25 inverted index over the chunks of a document, built from the same chunks as its FAISS index.
+
+    Attributes:
+    - postings (dict): (chunk id, term frequency) lists keyed by token.
+    - doc_lengths (list): The token count of each chunk.
+    """
+
+    def __init__(self, chunks):
+        self.postings = defaultdict(list)
+        self.doc_lengths = []
+        for doc_id, chunk in enumerate(chunks):
+            tokens = tokenize(chunk['text'])
+            if chunk.get('section'):
+                tokens.append(section_token(chunk['section']))
+            self.doc_lengths.append(len(tokens))
+            for token, frequency in Counter(tokens).items():
+                self.postings[token].append((doc_id, frequency))
+        self.postings = dict(self.postings)
+        self.doc_count = len(self.doc_lengths)
+        self.average_length = sum(self.doc_lengths) / self.doc_count if self.doc_count else 0.0
+
+    def idf(self, token):
+        """
+        Compute the BM25 inverse document frequency of a token.
+
+        Args:
+        - token (str): The token.
+
+        Returns:
+        - float: The IDF, 0 for tokens absent from the index.
+        """
+        document_frequency = len(self.postings.get(token, ()))
+        if not document_frequency:
+            return 0.0
+        return math.log(1 + (self.doc_count - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def scores(self, query):
+        """
+        Score the chunks matching a query with BM25.
+
+        Args:
+        - query (str): The query.
+
+        Returns:
+        - dict: The score of each chunk sharing a token with the query, keyed by chunk id.
+        """
+        scores = defaultdict(float)
+        for token in set(tokenize(query)):
+            idf = self.idf(token)
+            for doc_id, frequency in self.postings.get(token, ()):
+                length_norm = 1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / self.average_length
+                scores[doc_id] += idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+        return scores
+
+    def search(self, query, k=5):
+        """
+        Rank the chunks against a query with BM25.
+
+        Args:
+        - query (str): The query.
+        - k (int, optional): The number of chunks returned. Defaults to 5.
+
+        Returns:
+        - list: (chunk id, score) of the best chunks, best first.
+        """
+        return sorted(self.scores(query).items(), key=lambda item: -item[1])[:k]
+
+
+def route_query(query, lexical_index):
+    """
+    Decide whether a query can be answered from the lexical index alone.
+
+    Queries naming a section number the document contains, or made mostly of rare terms (product or manufacturer
+    names), are exact lookups; the rest need the vector search too.
+
+    Args:
+    - query (str): The query.
+    - lexical_index (LexicalIndex): The lexical index of the document.
+
+    Returns:
+    - str: lexical or hybrid.
+    """
+    tokens = set(tokenize(query))
+    if any(token.startswith("section:") and token in lexical_index.postings for token in tokens):
+        return "lexical"
+    known = [token for token in tokens if token in lexical_index.postings]
+    rare = [token for token in known if lexical_index.idf(token) >= RARE_TOKEN_IDF]
+    if known and len(rare) * 2 >= len(tokens):
+        return "lexical"
+    return "hybrid"
+
+
+def key_tokens(query, lexical_index):
+    """
+    Pick the tokens that decide what a query is about: section numbers, tokens with digits (model numbers, sizes) and
+    terms rare in the document. Two queries differing in these are about different things, however close their
+    embeddings are.
+
+    Args:
+    - query (str): The query.
+    - lexical_index (LexicalIndex): The lexical index of the document.
+
+    Returns:
+    - frozenset: The key tokens.
+    """
+    return frozenset(token for token in tokenize(query)
+                     if token.startswith("section:") or any(char.isdigit() for char in token)
+                     or (token in lexical_index.postings and lexical_index.idf(token) >= RARE_TOKEN_IDF))
+
+
+def fuse_rankings(rankings, k=5, rrf_k=RRF_K):
+    """
+    Merge ranked lists of chunk ids with reciprocal rank fusion, which needs no score calibration between them.
+
+    Args:
+    - rankings (list): Lists of chunk ids, best first.
+    - k (int, optional): The number of chunk ids returned. Defaults to 5.
+    - rrf_k (int, optional): The fusion constant. Defaults to RRF_K.
+
+    Returns:
+    - list: The fused chunk ids, best first.
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1 / (rrf_k + rank + 1)
+    return [doc_id for doc_id, _ in sorted(scores.items(), key=lambda item: -item[1])[:k]]
@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import tempfile
+import subprocess
+
+# Peak resident memory one extraction may reach on the synthetic spec book; the app runs in 2 GB containers
+# shared by several sessions
+PEAK_RSS_BUDGET_MB = float(os.getenv("PEAK_RSS_BUDGET_MB", "512"))
+SYNTHETIC_PAGES = int(os.getenv("SYNTHETIC_PAGES", "5000"))
+PAGES_PER_SECTION = 10
+MASTER_SECTION = "01 33 00"
+# MasterFormat 2004 divisions the synthetic sections are spread over
+DIVISIONS = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 21, 22, 23, 25, 26, 27, 28, 31, 32, 33]
+# Real TOCs list addons after their parent section, and numbers the spec book has no section for; one of each is
+# requested, and neither may make the extraction read pages twice
+ADDON_SUFFIX = ".13"
+ABSENT_SECTION = "48 99 00"
+
+FILLER_LINE = "Contractor shall furnish and install all products in accordance with the manufacturer's instructions."
+LINES_PER_PAGE = 45
+
+
+def synthetic_section_numbers(section_count):
+    """
+    Make distinct section numbers in MasterFormat order, the master section first and the third an addon of the second.
+
+    Args:
+    - section_count (int): The number of section numbers.
+
+    Returns:
+    - list: The section numbers.
+    """
+    numbers = [MASTER_SECTION]
+    for i in range(section_count - 1):
+        numbers.append(f"{DIVISIONS[i % len(DIVISIONS)]:02d} {40 + i // len(DIVISIONS):02d} 00")
+    numbers = [numbers[0]] + sorted(numbers[1:])
+    if len(numbers) > 2:
+        numbers[2] = numbers[1] + ADDON_SUFFIX
+    return numbers
+
+
+def build_synthetic_spec(path, page_count=SYNTHETIC_PAGES):
+    """
+    Write a spec book of page_count pages made of sections of PAGES_PER_SECTION pages, each with a SUBMITTALS article.
+
+    The PDF has no bookmarks, so extraction goes through the page heading probe, its slowest path.
+
+    Args:
+    - path (str): The path of the PDF to write.
+    - page_count (int, optional): The number of pages. Defaults to SYNTHETIC_PAGES.
+
+    Returns:
+    - list: The section numbers of the spec book.
+    """
+    import fitz
+
+    section_numbers = synthetic_section_numbers(max(1, page_count // PAGES_PER_SECTION))
+    document = fitz.open()
+    for page_num in range(page_count):
+        section_number = section_numbers[min(page_num // PAGES_PER_SECTION, len(section_numbers) - 1)]
+        lines = []
+        if page_num % PAGES_PER_SECTION == 0:
+            lines += [f"SECTION {section_number}", f"SYNTHETIC SECTION {section_number}", "PART 1 - GENERAL",
+                      "1.1 SUMMARY", FILLER_LINE, "1.2 SUBMITTALS",
+                      "A. Product Data: For each type of product.", "B. Shop Drawings: Include plans and details.",
+                      "1.3 QUALITY ASSURANCE"]
+        lines += [FILLER_LINE] * (LINES_PER_PAGE - len(lines))
+        if page_num % PAGES_PER_SECTION == PAGES_PER_SECTION - 1 or page_num == page_count - 1:
+            lines.append(f"END OF SECTION {section_number}")
+        page = document.new_page()
+        page.insert_text((36, 36), "\n".join(lines), fontsize=8)
+    document.save(path, garbage=3, deflate=True)
+    document.close()
+    return section_numbers
+
+
+def measure_extraction(pdf_path, section_numbers, output_dir):
+    """
+    Run one extraction in a fresh interpreter, with a single page extraction process, and measure its peak memory.
+
+    Args:
+    - pdf_path (str): The path of the spec book.
+    - section_numbers (list): The section numbers to extract.
+    - output_dir (str): The directory the artifacts are written to.
+
+    Returns:
+    - dict: The peak resident memory in MB, and the page and submittal counts of the extraction.
+    """
+    code = (
+        "import sys, json, resource\n"
+        "from submittals_pipeline import run_submittals_extraction\n"
+        "pdf_path, section_numbers, master_section, output_dir = json.loads(sys.argv[1])\n"
+        "result = run_submittals_extraction(pdf_path, section_numbers, master_section, 'Synthetic',\n"
+        "                                   output_dir=output_dir, max_workers=1)\n"
+        "peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+        "print(json.dumps({'peak_kb': peak // 1024 if sys.platform == 'darwin' else peak,\n"
+        "                  'pages': result['pages_extracted'], 'submittals': len(result['toc_entries'])}))\n"
+    )
+    args = json.dumps([pdf_path, section_numbers, MASTER_SECTION, output_dir])
+    completed = subprocess.run([sys.executable, "-c", code, args], capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode != 0:
+        raise RuntimeError(f"Extraction failed:\n{completed.stderr}")
+    measurement = json.loads(completed.stdout.strip().splitlines()[-1])
+    measurement["peak_rss_mb"] = measurement.pop("peak_kb") / 1024
+    return measurement
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = os.path.join(tmp_dir, "synthetic_spec.pdf")
+        section_numbers = build_synthetic_spec(pdf_path)
+        print(f"Synthetic spec book: {SYNTHETIC_PAGES} pages, {len(section_numbers)} sections, "
+              f"{os.path.getsize(pdf_path) / 1024 ** 2:.1f} MB")
+        measurement = measure_extraction(pdf_path, [*section_numbers, ABSENT_SECTION], tmp_dir)
+
+    print(f"Extracted {measurement['pages']} pages, {measurement['submittals']} submittals, "
+          f"peak RSS {measurement['peak_rss_mb']:.0f} MB")
+    failed = False
+    if measurement["peak_rss_mb"] > PEAK_RSS_BUDGET_MB:
+        print(f"FAIL: peak RSS {measurement['peak_rss_mb']:.0f} MB, over the {PEAK_RSS_BUDGET_MB:.0f} MB budget")
+        failed = True
+    if measurement["pages"] != SYNTHETIC_PAGES:
+        print(f"FAIL: {measurement['pages']} pages extracted rather than each of the {SYNTHETIC_PAGES} once")
+        failed = True
+    if measurement["submittals"] != len(section_numbers) - 1:
+        print(f"FAIL: {measurement['submittals']} submittals, expected one per section but the master section, "
+              f"{len(section_numbers) - 1}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
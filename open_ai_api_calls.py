@@ -1,14 +1,37 @@
 
+import random
 import streamlit as st
-from openai import OpenAI
+from openai import OpenAI, RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
 from tenacity import (
     retry,
+    retry_if_exception_type,
     stop_after_attempt,
     wait_random_exponential,
 )
 
 client = OpenAI()
 
+def wait_for_retry_after(retry_state):
+    """
+    Tenacity wait strategy honoring the Retry-After header of rate limited (429) responses.
+
+    The header value is used when the failed call returned one, plus up to a second of jitter so that
+    concurrent callers do not retry in lockstep. Otherwise it falls back to a random exponential backoff.
+
+    Args:
+        retry_state (tenacity.RetryCallState): The state of the retried call.
+
+    Returns:
+        float: The number of seconds to wait before the next attempt.
+    """
+    exception = retry_state.outcome.exception()
+    response = getattr(exception, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    try:
+        return float(retry_after) + random.uniform(0, 1)
+    except (TypeError, ValueError):
+        return wait_random_exponential(min=1, max=60)(retry_state)
+
 def upload_file_OpenAI(file, purpose):
     """
     Upload a file to OpenAI.
@@ -303,4 +326,30 @@ def retrieve_OpenAI_run(thread_id, run_id):
     return client.beta.threads.runs.retrieve(
         thread_id=thread_id,
         run_id=run_id,
-    )
\ No newline at end of file
+    )
+
+
+@retry(
+    retry=retry_if_exception_type((RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)),
+    wait=wait_for_retry_after,
+    stop=stop_after_attempt(6),
+    reraise=True,
+)
+def create_OpenAI_embeddings(inputs, model):
+    """
+    Create embeddings for a batch of inputs, retrying rate limited and transient failures.
+
+    The client's own retries are disabled for this call so that the retry schedule above is the only one.
+
+    Parameters:
+    inputs (list): The texts to embed. Each text must fit in the model's input limit.
+    model (str): The ID of the embedding model to use.
+
+    Returns:
+    dict: The response from the API call. The response is a dictionary representing an embedding list with the following keys:
+        - object (str): The object type, always 'list'.
+        - data (list): The embedding objects. Each has an 'index' (int) into inputs and an 'embedding' (list of float).
+        - model (str): The model used to create the embeddings.
+        - usage (dict): The 'prompt_tokens' and 'total_tokens' consumed by the request.
+    """
+    return client.with_options(max_retries=0).embeddings.create(input=inputs, model=model)
@@ -0,0 +1,252 @@
+import os
+import re
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import fitz  # PyMuPDF
+
+# Number of worker processes used for page text extraction (defaults to the CPU count)
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0")) or os.cpu_count() or 1
+# Documents with fewer pages than this are extracted serially; spawning workers costs more than it saves
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+# Workers are only started when each of them gets at least this many pages
+MIN_PAGES_PER_WORKER = 16
+# Each worker receives several small page ranges so that slow (scanned, table heavy) pages balance out
+CHUNKS_PER_WORKER = 4
+
+# Section numbers as they appear in bookmark titles and page headings ("01 33 00", "013300", "01300", "01 330"),
+# with their addon suffix if any ("26 05 19.13"); page headings may also use the "013 -" form
+SECTION_BOOKMARK_PATTERN = re.compile(
+    r'\s*(?:SECTION\s+)?((?:\d{2} ?\d{2} ?\d{2}|\d{5}|\d{2} \d{3}|\d{3} \d{3})(?:\.\d{2})?)(?!\d)', re.IGNORECASE)
+SECTION_HEADING_PROBE_PATTERN = re.compile(
+    r'SECTION\s+((?:\d{2} ?\d{2} ?\d{2}|\d{5}|\d{2} \d{3}|\d{3} \d{3})(?:\.\d{2})?|\d{3}(?= -))(?!\d)')
+# Share of the page height, from the top, searched for a section heading by the page probe
+HEADING_PROBE_HEIGHT = 0.3
+# Pages whose top names more distinct sections than this are tables of contents, not section starts
+HEADING_PROBE_MAX_SECTIONS = 3
+# Bookmarks are only trusted when they cover at least this share of the requested sections
+BOOKMARK_MIN_COVERAGE = 0.5
+
+_worker_document = None
+
+
+def open_pdf(pdf):
+    """
+    Open a PDF given either as a file path or as its content.
+
+    A path is preferred for large documents: MuPDF then reads pages from the file as they are loaded, rather than
+    the whole content being held in memory, and worker processes receive the path instead of a copy of the bytes.
+
+    Args:
+    - pdf (str or bytes): The path of the PDF file, or its content.
+
+    Returns:
+    - fitz.Document: The opened document.
+    """
+    if isinstance(pdf, (str, os.PathLike)):
+        return fitz.open(pdf)
+    return fitz.open(stream=pdf, filetype="pdf")
+
+
+def section_digits(section_number):
+    """
+    Normalize a section number for page lookups ("01 33 00", "013300" and "01 33 00 -" all become "013300").
+
+    Args:
+    - section_number (str): The section number.
+
+    Returns:
+    - str: The digits of the section number.
+    """
+    return re.sub(r'\D', '', section_number)
+
+
+def _page_text(document, page_num):
+    return document.load_page(page_num).get_text()
+
+
+def _probe_page(document, page_num):
+    page = document.load_page(page_num)
+    rect = page.rect
+    top = fitz.Rect(rect.x0, rect.y0, rect.x1, rect.y0 + rect.height * HEADING_PROBE_HEIGHT)
+    text = page.get_text(clip=top)
+    return list(dict.fromkeys(section_digits(match.group(1)) for match in SECTION_HEADING_PROBE_PATTERN.finditer(text)))
+
+
+_PAGE_TASKS = {"text": _page_text, "probe": _probe_page}
+
+
+def _init_worker(pdf):
+    global _worker_document
+    _worker_document = open_pdf(pdf)
+
+
+def _run_page_task(task, page_numbers):
+    return [_PAGE_TASKS[task](_worker_document, page_num) for page_num in page_numbers]
+
+
+def _split_pages(page_numbers, chunk_count):
+    chunk_size = max(1, -(-len(page_numbers) // chunk_count))
+    return [page_numbers[i:i + chunk_size] for i in range(0, len(page_numbers), chunk_size)]
+
+
+class PagePool:
+    """
+    Worker processes running the page tasks of one PDF, started on first use and reused by every call given the pool,
+    so that a multi-batch extraction spawns them, and imports PyMuPDF in them, once.
+
+    Attributes:
+    - pdf (str or bytes): The path of the PDF file, or its content, opened once by each worker.
+    - max_workers (int): The number of worker processes.
+    """
+
+    def __init__(self, pdf, max_workers=None):
+        self.pdf = pdf
+        self.max_workers = max_workers or PDF_EXTRACT_WORKERS
+        self._executor = None
+
+    def executor(self):
+        """
+        Return the process pool, starting it on first use.
+
+        Returns:
+        - ProcessPoolExecutor: The pool.
+        """
+        if self._executor is None:
+            # Streamlit runs the script alongside several server threads, so workers are spawned rather than forked
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=_init_worker, initargs=(self.pdf,))
+        return self._executor
+
+    def close(self):
+        """Stop the worker processes, if they were started."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _map_pages(pdf, task, page_numbers, max_workers=None, progress=None, pool=None):
+    document = open_pdf(pdf)
+    page_numbers = [page_num for page_num in page_numbers if 0 <= page_num < document.page_count]
+    page_count = len(page_numbers)
+    if pool is not None:
+        max_workers = pool.max_workers
+    max_workers = min(max_workers or PDF_EXTRACT_WORKERS, page_count // MIN_PAGES_PER_WORKER)
+
+    if max_workers <= 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+        results = []
+        for page_num in page_numbers:
+            results.append(_PAGE_TASKS[task](document, page_num))
+            if progress:
+                progress(len(results), page_count)
+        return results
+    document.close()
+
+    chunks = _split_pages(page_numbers, max_workers * CHUNKS_PER_WORKER)
+    own_pool = pool is None
+    if own_pool:
+        pool = PagePool(pdf, max_workers)
+    futures = []
+    try:
+        futures = [pool.executor().submit(_run_page_task, task, chunk) for chunk in chunks]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+            if progress:
+                progress(len(results), page_count)
+    finally:
+        if own_pool:
+            pool.close()
+        else:
+            # A shared pool outlives this call; the chunks not started yet are dropped if it stops early
+            for future in futures:
+                future.cancel()
+    return results
+
+
+def extract_pages(pdf, page_numbers, max_workers=None, progress=None, pool=None):
+    """
+    Extract the text of the given pages of a PDF.
+
+    Many pages are split across a process pool. Each worker opens the PDF itself once and extracts
+    the pages it is handed. Few pages, or a worker count of 1, are extracted serially.
+
+    Args:
+    - pdf (str or bytes): The path of the PDF file, or its content.
+    - page_numbers (iterable): The zero-based indices of the pages to extract. Pages past the end are skipped.
+    - max_workers (int, optional): The number of worker processes. Defaults to PDF_EXTRACT_WORKERS.
+    - progress (callable, optional): Called with (pages_done, page_count) as pages are extracted. An exception it
+      raises aborts the extraction. Defaults to None.
+    - pool (PagePool, optional): The worker processes to use instead of starting new ones. Defaults to None.
+
+    Returns:
+    - list: The text of each page, in the order of page_numbers.
+    """
+    return _map_pages(pdf, "text", page_numbers, max_workers, progress, pool)
+
+
+def _bookmark_section_starts(document):
+    starts = []
+    for _, title, page in document.get_toc(simple=True):
+        match = SECTION_BOOKMARK_PATTERN.match(title)
+        if match and page >= 1:
+            starts.append((page - 1, section_digits(match.group(1))))
+    return starts
+
+
+def _probe_section_starts(pdf, page_count, max_workers=None, progress=None, pool=None):
+    starts = []
+    headings = _map_pages(pdf, "probe", range(page_count), max_workers, progress, pool)
+    for page_num, page_sections in enumerate(headings):
+        if 0 < len(page_sections) <= HEADING_PROBE_MAX_SECTIONS:
+            starts.extend((page_num, digits) for digits in page_sections)
+    return starts
+
+
+def locate_section_pages(pdf, section_numbers=None, max_workers=None, progress=None, pool=None):
+    """
+    Map the sections of a spec book to the pages they span, without extracting the text of every page.
+
+    The PDF bookmarks are used when they cover enough of the requested sections. Otherwise the top of each page
+    is probed for a "SECTION xx xx xx" heading; requested sections the bookmarks do not list (addons often have
+    none) are then looked up with the probe as well. A section runs from the first page it is found on to the first
+    page of the next section, inclusive, since a section can end on the page the next one starts on.
+
+    Args:
+    - pdf (str or bytes): The path of the PDF file, or its content.
+    - section_numbers (list, optional): The section numbers that will be looked up, used to judge the bookmarks.
+    - max_workers (int, optional): The number of worker processes of the page probe. Defaults to PDF_EXTRACT_WORKERS.
+    - progress (callable, optional): Called with (pages_done, page_count) as pages are probed. Defaults to None.
+    - pool (PagePool, optional): The worker processes of the page probe, instead of starting new ones. Defaults to None.
+
+    Returns:
+    - dict: Zero-based (first_page, last_page) inclusive page ranges keyed by section digits, see section_digits.
+    """
+    with open_pdf(pdf) as document:
+        page_count = document.page_count
+        starts = _bookmark_section_starts(document)
+
+    wanted = {section_digits(number) for number in section_numbers or []}
+    found = {digits for _, digits in starts}
+    if not starts or (wanted and len(wanted & found) < BOOKMARK_MIN_COVERAGE * len(wanted)):
+        starts = _probe_section_starts(pdf, page_count, max_workers, progress, pool)
+    elif wanted - found:
+        missing = wanted - found
+        starts += [(page_num, digits) for page_num, digits in
+                   _probe_section_starts(pdf, page_count, max_workers, progress, pool) if digits in missing]
+
+    first_pages = {}
+    for page_num, digits in sorted(starts):
+        first_pages.setdefault(digits, page_num)
+    ordered = sorted((page_num, digits) for digits, page_num in first_pages.items())
+    section_pages = {}
+    for i, (page_num, digits) in enumerate(ordered):
+        next_start = next((next_page for next_page, _ in ordered[i + 1:] if next_page > page_num), page_count - 1)
+        section_pages[digits] = (page_num, next_start)
+    return section_pages
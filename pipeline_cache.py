@@ -0,0 +1,168 @@
+import os
+import json
+import pickle
+import hashlib
+import time
+import tempfile
+
+# Bump whenever a change to the extraction pipeline or the exporters changes their output
+PIPELINE_VERSION = "10"
+# Directory holding one pickle file per cached pipeline run
+PIPELINE_CACHE_DIR = os.getenv("SUBMITTALS_CACHE_DIR", ".submittals_cache")
+# Total size of the cache directory after which the least recently used entries are evicted
+PIPELINE_CACHE_MAX_BYTES = int(os.getenv("SUBMITTALS_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+# Directory the uploaded PDFs are spooled to, one file per distinct document
+PDF_SPOOL_DIR = os.getenv("SUBMITTALS_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "submittals_spool"))
+# Spooled PDFs not uploaded again for this many seconds are removed
+PDF_SPOOL_MAX_AGE_S = int(os.getenv("SUBMITTALS_SPOOL_MAX_AGE_S", str(24 * 3600)))
+SPOOL_CHUNK_BYTES = 1024 * 1024
+
+
+def spool_pdf(file_obj, spool_dir=PDF_SPOOL_DIR, max_age_s=PDF_SPOOL_MAX_AGE_S):
+    """
+    Copy an uploaded PDF to disk in chunks, hashing it on the way, so that the pipeline opens the file by path
+    instead of holding its bytes in the session.
+
+    The file is named after its content, so uploading the same document again, from any session, reuses it.
+
+    Args:
+    - file_obj (file-like): The uploaded file, read from its start.
+    - spool_dir (str, optional): The spool directory. Defaults to PDF_SPOOL_DIR.
+    - max_age_s (int, optional): The age after which other spooled files are removed. Defaults to PDF_SPOOL_MAX_AGE_S.
+
+    Returns:
+    - tuple: The path of the spooled file and the hex SHA-256 digest of its content.
+    """
+    os.makedirs(spool_dir, exist_ok=True)
+    file_obj.seek(0)
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=spool_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in iter(lambda: file_obj.read(SPOOL_CHUNK_BYTES), b""):
+                digest.update(chunk)
+                f.write(chunk)
+        pdf_hash = digest.hexdigest()
+        path = os.path.join(spool_dir, f"{pdf_hash}.pdf")
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    evict_spooled_pdfs(spool_dir, max_age_s)
+    return path, pdf_hash
+
+
+def evict_spooled_pdfs(spool_dir=PDF_SPOOL_DIR, max_age_s=PDF_SPOOL_MAX_AGE_S):
+    """
+    Remove the spooled PDFs that were not uploaded again within max_age_s.
+
+    Args:
+    - spool_dir (str, optional): The spool directory. Defaults to PDF_SPOOL_DIR.
+    - max_age_s (int, optional): The maximum age of a spooled file in seconds. Defaults to PDF_SPOOL_MAX_AGE_S.
+    """
+    oldest = time.time() - max_age_s
+    with os.scandir(spool_dir) as it:
+        for entry in it:
+            if entry.name.endswith(".pdf") and entry.stat().st_mtime < oldest:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+
+def make_cache_key(pdf_hash, start_page, end_page, special_section_number, project_name):
+    """
+    Build the cache key of a pipeline run.
+
+    The project name is part of the key because it is printed on the title page of every generated artifact.
+
+    Args:
+    - pdf_hash (str): The SHA-256 digest of the uploaded PDF, see spool_pdf.
+    - start_page (int): The first page of the table of contents.
+    - end_page (int): The last page of the table of contents.
+    - special_section_number (str): The submittals master section number.
+    - project_name (str): The name of the project.
+
+    Returns:
+    - str: The hex digest identifying the run.
+    """
+    key_parts = [PIPELINE_VERSION, pdf_hash, int(start_page), int(end_page), special_section_number, project_name]
+    return hashlib.sha256(json.dumps(key_parts).encode("utf-8")).hexdigest()
+
+
+def _entry_path(cache_key, cache_dir):
+    return os.path.join(cache_dir, f"{cache_key}.pkl")
+
+
+def load_cached_result(cache_key, cache_dir=PIPELINE_CACHE_DIR):
+    """
+    Load the result of a previous pipeline run and mark it as recently used.
+
+    Args:
+    - cache_key (str): The key built by make_cache_key.
+    - cache_dir (str, optional): The cache directory. Defaults to PIPELINE_CACHE_DIR.
+
+    Returns:
+    - dict or None: The cached result, or None on a miss or an unreadable entry.
+    """
+    path = _entry_path(cache_key, cache_dir)
+    try:
+        with open(path, "rb") as f:
+            result = pickle.load(f)
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, pickle.UnpicklingError, EOFError):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    return result
+
+
+def store_cached_result(cache_key, result, cache_dir=PIPELINE_CACHE_DIR, max_bytes=PIPELINE_CACHE_MAX_BYTES):
+    """
+    Store the result of a pipeline run, then evict least recently used entries above the size limit.
+
+    Args:
+    - cache_key (str): The key built by make_cache_key.
+    - result (dict): The picklable pipeline result.
+    - cache_dir (str, optional): The cache directory. Defaults to PIPELINE_CACHE_DIR.
+    - max_bytes (int, optional): The size limit of the cache directory. Defaults to PIPELINE_CACHE_MAX_BYTES.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, _entry_path(cache_key, cache_dir))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    evict_cached_results(cache_dir, max_bytes)
+
+
+def evict_cached_results(cache_dir=PIPELINE_CACHE_DIR, max_bytes=PIPELINE_CACHE_MAX_BYTES):
+    """
+    Remove the least recently used cache entries until the cache fits in max_bytes.
+
+    Args:
+    - cache_dir (str, optional): The cache directory. Defaults to PIPELINE_CACHE_DIR.
+    - max_bytes (int, optional): The size limit of the cache directory. Defaults to PIPELINE_CACHE_MAX_BYTES.
+    """
+    entries = []
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.name.endswith(".pkl"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_bytes -= size
@@ -0,0 +1,184 @@
+import os
+import time
+import weakref
+import threading
+from concurrent.futures import Future
+
+# Memory the cached resources may take before unused ones are evicted, least recently used first
+RESOURCE_CACHE_MAX_MB = float(os.getenv("RESOURCE_CACHE_MAX_MB", "512"))
+
+
+class _Entry:
+    def __init__(self):
+        self.future = Future()
+        self.refcount = 0
+        self.last_used = time.monotonic()
+        self.sizeof = None
+
+    @property
+    def nbytes(self):
+        if not self.future.done() or self.future.exception() is not None:
+            return 0
+        return self.sizeof(self.future.result())
+
+
+def _default_sizeof(value):
+    return getattr(value, "nbytes", 0)
+
+
+class ResourceHandle:
+    """
+    A pinned reference to a cached resource, kept in st.session_state for as long as the session uses it.
+
+    The pin is released by release, or when the handle is garbage collected along with the session state.
+
+    Attributes:
+    - key (str): The key of the resource.
+    - value: The resource.
+    - built (bool): Whether the resource was built for this handle, rather than found in the cache.
+    """
+
+    def __init__(self, cache, key, value, built):
+        self.key = key
+        self.value = value
+        self.built = built
+        self._finalizer = weakref.finalize(self, cache.release, key)
+
+    def release(self):
+        """Unpin the resource; it stays cached until it is evicted."""
+        self._finalizer()
+
+
+class ResourceCache:
+    """
+    Process-wide cache of read-only resources shared by every Streamlit session: document models, vector indexes.
+
+    A resource is built once per key, even when several sessions ask for it at the same time. Resources pinned by a
+    session (see acquire) are never evicted; unpinned ones are evicted least recently used first once the cache
+    holds more than max_bytes.
+
+    Attributes:
+    - max_bytes (int): The memory ceiling.
+    - hits (int): The lookups answered from the cache, including those that waited for a build in progress.
+    - misses (int): The lookups that built their resource.
+    - evictions (int): The resources evicted to stay under the ceiling.
+    """
+
+    def __init__(self, max_bytes=int(RESOURCE_CACHE_MAX_MB * 1024 ** 2)):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key, loader, sizeof, pin):
+        with self._lock:
+            entry = self._entries.get(key)
+            build = entry is None
+            if build:
+                entry = self._entries[key] = _Entry()
+                entry.sizeof = sizeof or _default_sizeof
+                self.misses += 1
+            else:
+                self.hits += 1
+            entry.last_used = time.monotonic()
+            if pin:
+                entry.refcount += 1
+        if build:
+            try:
+                entry.future.set_result(loader())
+            except BaseException as e:
+                entry.future.set_exception(e)
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+        try:
+            value = entry.future.result()
+        except BaseException:
+            if pin and not build:
+                self.release(key)
+            raise
+        self.enforce_limit()
+        return value, build
+
+    def get(self, key, loader, sizeof=None):
+        """
+        Return a resource, building it with loader on a miss, without pinning it.
+
+        Args:
+        - key (str): The key of the resource, e.g. derived from the document hash.
+        - loader (callable): Builds the resource; called without arguments.
+        - sizeof (callable, optional): Returns the memory taken by the resource in bytes. Defaults to its nbytes
+          attribute, or 0; it is evaluated at every limit check, so resources that grow are accounted for.
+
+        Returns:
+        - The resource.
+        """
+        return self._lookup(key, loader, sizeof, pin=False)[0]
+
+    def acquire(self, key, loader, sizeof=None):
+        """
+        Return a pinned resource, building it with loader on a miss, see get.
+
+        Returns:
+        - ResourceHandle: The handle holding the resource; the resource cannot be evicted until it is released.
+        """
+        return ResourceHandle(self, key, *self._lookup(key, loader, sizeof, pin=True))
+
+    def release(self, key):
+        """
+        Unpin a resource acquired with acquire.
+
+        Args:
+        - key (str): The key of the resource.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.refcount > 0:
+                entry.refcount -= 1
+        self.enforce_limit()
+
+    def discard(self, key):
+        """
+        Drop a resource that is no longer needed, unless a session pins it or it is still being built.
+
+        Args:
+        - key (str): The key of the resource.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.refcount == 0 and entry.future.done():
+                del self._entries[key]
+
+    def enforce_limit(self):
+        """Evict unpinned resources, least recently used first, until the cache is under its ceiling."""
+        with self._lock:
+            total = sum(entry.nbytes for entry in self._entries.values())
+            evictable = sorted((entry.last_used, key) for key, entry in self._entries.items()
+                               if entry.refcount == 0 and entry.future.done())
+            for _, key in evictable:
+                if total <= self.max_bytes:
+                    break
+                total -= self._entries.pop(key).nbytes
+                self.evictions += 1
+
+    def stats(self):
+        """
+        Report the cache counters.
+
+        Returns:
+        - dict: The hit, miss and eviction counts, the number of resources held and pinned, and their size in bytes.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "pinned": sum(1 for entry in self._entries.values() if entry.refcount),
+                "nbytes": sum(entry.nbytes for entry in self._entries.values()),
+            }
+
+
+shared_cache = ResourceCache()
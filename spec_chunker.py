@@ -0,0 +1,122 @@
+import os
+import re
+import textwrap
+
+# Largest chunk, in characters; longer paragraphs are split at line, then word boundaries
+SPEC_CHUNK_MAX_CHARS = int(os.getenv("SPEC_CHUNK_MAX_CHARS", "1000"))
+# Articles and parts shorter than this are packed together with the next one, within the same section
+SPEC_CHUNK_MIN_CHARS = int(os.getenv("SPEC_CHUNK_MIN_CHARS", "200"))
+
+SECTION_START_PATTERN = re.compile(r'\s*SECTION\s+(\d{2} ?\d{2} ?\d{2}|\d{5}|\d{2} \d{3}|\d{3} \d{3})(?!\d)')
+SECTION_END_PATTERN = re.compile(r'\s*END OF SECTION')
+# "PART 1 - GENERAL" and "1.3 SUBMITTALS" start a new chunk once the current one is long enough
+PART_PATTERN = re.compile(r'\s*PART\s+\d+\b')
+ARTICLE_PATTERN = re.compile(r'\s*\d{1,2}\.\d{1,2}\s+\S')
+# Lettered and numbered paragraphs ("A. Product Data", "1. Include") are where oversized articles are split
+PARAGRAPH_PATTERN = re.compile(r'\s*(?:[A-Z]|\d{1,2})\.\s+\S')
+
+
+class _ChunkBuilder:
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self.chunks = []
+        self.lines = []
+        self.length = 0
+        self.page = None
+        self.section = None
+        self.paragraph = []
+        self.paragraph_length = 0
+
+    def flush(self):
+        text = "\n".join(self.lines).strip()
+        if text:
+            self.chunks.append({'text': text, 'section': self.section, 'page': self.page})
+        self.lines = []
+        self.length = 0
+
+    def _add_line(self, line, page):
+        if len(line) + 1 > self.max_chars:
+            # A single line over the limit (text extracted without line breaks) is cut at word boundaries
+            for piece in textwrap.wrap(line, self.max_chars - 1, break_on_hyphens=False):
+                self._add_line(piece, page)
+            return
+        if self.length + len(line) + 1 > self.max_chars:
+            self.flush()
+        self.append(line, page)
+
+    def append(self, line, page):
+        if not self.lines:
+            self.page = page
+        self.lines.append(line)
+        self.length += len(line) + 1
+
+    def extend_paragraph(self, line, page):
+        self.paragraph.append((line, page))
+        self.paragraph_length += len(line) + 1
+
+    def commit_paragraph(self):
+        # Paragraphs are packed whole; one that does not fit starts a new chunk, one over the limit is split by lines
+        if self.length + self.paragraph_length > self.max_chars:
+            self.flush()
+        for line, page in self.paragraph:
+            self._add_line(line, page)
+        self.paragraph = []
+        self.paragraph_length = 0
+
+
+def chunk_spec_pages(page_texts, max_chars=SPEC_CHUNK_MAX_CHARS, min_chars=SPEC_CHUNK_MIN_CHARS):
+    """
+    Split the text of a spec book into chunks along its structure, in one pass over its lines.
+
+    Chunks never straddle a SECTION heading or an END OF SECTION. Within a section, a new chunk starts at a PART or
+    an N.NN article once the current chunk has min_chars. Lettered and numbered paragraphs are packed whole up to
+    max_chars; only a paragraph longer than that is split, at line and then word boundaries. Chunks do not overlap.
+
+    Args:
+    - page_texts (iterable): The text of each page, in page order.
+    - max_chars (int, optional): The largest chunk size in characters. Defaults to SPEC_CHUNK_MAX_CHARS.
+    - min_chars (int, optional): The size below which articles are packed together. Defaults to SPEC_CHUNK_MIN_CHARS.
+
+    Returns:
+    - list: The chunks as dicts with their text, the section number they belong to (None outside sections) and
+      the one-based page they start on.
+    """
+    builder = _ChunkBuilder(max_chars)
+    for page_num, page_text in enumerate(page_texts, start=1):
+        for line in page_text.split("\n"):
+            section_match = SECTION_START_PATTERN.match(line)
+            if section_match:
+                builder.commit_paragraph()
+                builder.flush()
+                builder.section = section_match.group(1)
+            elif SECTION_END_PATTERN.match(line):
+                # The end marker stays with the last chunk of its section, whatever its size
+                builder.commit_paragraph()
+                builder.append(line, page_num)
+                builder.flush()
+                builder.section = None
+                continue
+            elif PART_PATTERN.match(line) or ARTICLE_PATTERN.match(line):
+                builder.commit_paragraph()
+                if builder.length >= min_chars:
+                    builder.flush()
+            elif PARAGRAPH_PATTERN.match(line):
+                builder.commit_paragraph()
+            builder.extend_paragraph(line, page_num)
+    builder.commit_paragraph()
+    builder.flush()
+    return builder.chunks
+
+
+def format_chunk(chunk):
+    """
+    Render a chunk for a prompt, prefixed with where it comes from.
+
+    Args:
+    - chunk (dict): A chunk made by chunk_spec_pages.
+
+    Returns:
+    - str: The chunk text, headed by its section number and page.
+    """
+    source = f"SECTION {chunk['section']}, page {chunk['page']}" if chunk['section'] else f"Page {chunk['page']}"
+    return f"[{source}]\n{chunk['text']}"
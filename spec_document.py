@@ -0,0 +1,178 @@
+import os
+import hashlib
+import threading
+import numpy as np
+
+
+class SpecDocument:
+    """
+    The extracted text of a PDF, shared by the TOC lookup and the chat panel; the section extraction reuses the pages
+    it holds but keeps the pages it extracts itself only one batch at a time, see SectionPageReader. The chat panel
+    drops the document once its pages are chunked, see release_document.
+
+    Every page is extracted at most once, on first use, and its UTF-8 text is appended to a single contiguous
+    buffer. The byte range of each page in the buffer is kept in an integer array, rather than one Python string
+    per page, so a document costs about the size of its text.
+
+    Attributes:
+    - pdf (str or bytes): The path of the PDF file, or its content.
+    - page_count (int): The number of pages of the PDF.
+    - buffer (bytearray): The UTF-8 text of the extracted pages, in extraction order.
+    - page_offsets (numpy.ndarray): The (start, end) byte offsets of each page in buffer, -1 for pages not
+      extracted yet.
+    """
+
+    def __init__(self, pdf):
+        from pdf_text_extraction import open_pdf
+        self.pdf = pdf
+        with open_pdf(pdf) as document:
+            self.page_count = document.page_count
+        self.buffer = bytearray()
+        self.page_offsets = np.full((self.page_count, 2), -1, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return len(self.buffer) + self.page_offsets.nbytes
+
+    def missing_pages(self, page_numbers):
+        """
+        List the pages that were not extracted yet.
+
+        Args:
+        - page_numbers (iterable): Zero-based page numbers; pages past the end are ignored.
+
+        Returns:
+        - list: The sorted page numbers still to extract.
+        """
+        return sorted(page_num for page_num in set(page_numbers)
+                      if 0 <= page_num < self.page_count and self.page_offsets[page_num, 0] < 0)
+
+    def load_pages(self, page_numbers, max_workers=None, progress=None):
+        """
+        Extract the pages that were not extracted yet, in parallel, see pdf_text_extraction.extract_pages.
+
+        Args:
+        - page_numbers (iterable): Zero-based page numbers.
+        - max_workers (int, optional): The number of worker processes. Defaults to PDF_EXTRACT_WORKERS.
+        - progress (callable, optional): Called with (pages_done, page_count) as pages are extracted.
+
+        Returns:
+        - int: The number of pages extracted by this call.
+        """
+        from pdf_text_extraction import extract_pages
+        with self._lock:
+            missing = self.missing_pages(page_numbers)
+            if not missing:
+                return 0
+            for page_num, page_text in zip(missing, extract_pages(self.pdf, missing, max_workers, progress)):
+                start = len(self.buffer)
+                self.buffer += page_text.encode("utf-8")
+                self.page_offsets[page_num] = (start, len(self.buffer))
+            return len(missing)
+
+    def has_page(self, page_num):
+        """
+        Tell whether a page was extracted already.
+
+        Args:
+        - page_num (int): The zero-based page number.
+
+        Returns:
+        - bool: True if the text of the page is in the buffer.
+        """
+        return 0 <= page_num < self.page_count and self.page_offsets[page_num, 0] >= 0
+
+    def page_text(self, page_num):
+        """
+        Return the text of an extracted page.
+
+        Args:
+        - page_num (int): The zero-based page number.
+
+        Returns:
+        - str: The text of the page.
+        """
+        start, end = self.page_offsets[page_num]
+        if start < 0:
+            raise KeyError(f"Page {page_num} was not extracted")
+        return self.buffer[start:end].decode("utf-8")
+
+    def text(self, page_numbers, max_workers=None):
+        """
+        Return the text of pages joined in the order given, extracting those not extracted yet.
+
+        Args:
+        - page_numbers (iterable): Zero-based page numbers; pages past the end are skipped.
+        - max_workers (int, optional): The number of worker processes. Defaults to PDF_EXTRACT_WORKERS.
+
+        Returns:
+        - str: The joined text.
+        """
+        page_numbers = [page_num for page_num in page_numbers if 0 <= page_num < self.page_count]
+        self.load_pages(page_numbers, max_workers)
+        offsets = self.page_offsets[page_numbers]
+        # Pages extracted together in page order sit next to each other in the buffer and are decoded in one go
+        if len(offsets) and np.array_equal(offsets[1:, 0], offsets[:-1, 1]):
+            return self.buffer[offsets[0, 0]:offsets[-1, 1]].decode("utf-8")
+        return "".join(self.buffer[start:end].decode("utf-8") for start, end in offsets)
+
+    def iter_page_texts(self, max_workers=None, progress=None):
+        """
+        Yield the text of every page, extracting those not extracted yet; pages are decoded one at a time, so the
+        whole text is never held as strings next to the buffer.
+
+        Args:
+        - max_workers (int, optional): The number of worker processes. Defaults to PDF_EXTRACT_WORKERS.
+        - progress (callable, optional): Called with (pages_done, page_count) as pages are extracted.
+
+        Yields:
+        - str: The text of each page, in page order.
+        """
+        self.load_pages(range(self.page_count), max_workers, progress)
+        for page_num in range(self.page_count):
+            yield self.page_text(page_num)
+
+
+def document_key(pdf):
+    """
+    Identify a PDF for the document cache: spooled files by path, size and modification time, content by hash.
+
+    Args:
+    - pdf (str or bytes): The path of the PDF file, or its content.
+
+    Returns:
+    - str: The key.
+    """
+    if isinstance(pdf, (str, os.PathLike)):
+        stat = os.stat(pdf)
+        return f"{os.path.abspath(pdf)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha256(pdf).hexdigest()
+
+
+def get_document(pdf):
+    """
+    Return the shared document of a PDF, so its pages are extracted once per process whichever step needs them.
+
+    Documents are held in resource_cache.shared_cache, which evicts the least recently used ones once its memory
+    ceiling is reached.
+
+    Args:
+    - pdf (str or bytes): The path of the PDF file, or its content.
+
+    Returns:
+    - SpecDocument: The document.
+    """
+    from resource_cache import shared_cache
+    return shared_cache.get("document:" + document_key(pdf), lambda: SpecDocument(pdf))
+
+
+def release_document(pdf):
+    """
+    Drop the shared document of a PDF from the cache, once its text is held elsewhere (e.g. as chat chunks).
+
+    Args:
+    - pdf (str or bytes): The path of the PDF file, or its content.
+    """
+    from resource_cache import shared_cache
+    shared_cache.discard("document:" + document_key(pdf))
@@ -0,0 +1,917 @@
+import os
+import re
+import sys
+import csv
+import json
+import time
+import zipfile
+import argparse
+import functools
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# PyMuPDF, openpyxl, python-docx and ReportLab are imported inside the functions that use them, so that importing
+# this module from the Streamlit page stays cheap.
+
+# Function to extract text from specified table of content pages of uploaded PDF (Specs). The pages are read from the
+# shared document of the PDF, see spec_document.get_document, so the later steps do not extract them again.
+def extract_text_from_pdf(file, start_page, end_page):
+    from spec_document import get_document
+    return get_document(file).text(range(start_page - 1, end_page))
+
+# Function to extract the section numbers listed in the TOC pages, and the same list extended with their addons
+def find_section_numbers(file, start_page, end_page, min_confidence=None):
+    pdf_text = extract_text_from_pdf(file, start_page, end_page)
+    section_numbers = extract_section_numbers(pdf_text, min_confidence=min_confidence)
+    addons = find_addons(pdf_text, section_numbers)
+    all_section_numbers = section_numbers + [addon for addon in addons if addon not in section_numbers]
+    return section_numbers, all_section_numbers
+
+SECTION_NUMBER_PATTERN = re.compile(
+    r'(\b\d{2} \d{2} \d{2}\b|\b\d{6}\b|\b\d{3} \d{3}\b|\b\d{2} \d{4}\b|'
+    r'\b\d{5}\b|\b\d{2} \d{3}\b|\b\d{3} \d{2}\b|'
+    r'\b\d{4}\b|\b\d{2} \d{2}\b|'
+    r'\b\d{3} \-)', re.MULTILINE)
+
+# Section numbers scoring below this confidence are dropped from the TOC candidates (0 keeps every candidate)
+SECTION_CONFIDENCE_THRESHOLD = float(os.getenv("SECTION_CONFIDENCE_THRESHOLD", "0.5"))
+
+# Prior confidence of each numbering shape; bare 4 digit numbers are mostly years and page numbers
+SECTION_SHAPE_SCORES = {
+    'NN NN NN': 0.5, 'NNNNNN': 0.45, 'NNNNN': 0.35, 'NN NNNN': 0.3, 'NNN NNN': 0.25,
+    'NN NNN': 0.2, 'NNN NN': 0.2, 'NNN -': 0.15, 'NN NN': 0.15, 'NNNN': 0.1,
+}
+# MasterFormat 2004 divisions (6 digit numbers) and MasterFormat 1995 divisions (5 digit numbers)
+MASTERFORMAT_2004_DIVISIONS = {*range(0, 15), 21, 22, 23, 25, 26, 27, 28, 31, 32, 33, 34, 35, *range(40, 47), 48}
+MASTERFORMAT_1995_DIVISIONS = set(range(0, 17))
+
+SECTION_TITLE_PATTERN_AFTER = re.compile(r"\s*[-\u2013\u2014:]?\s*[A-Za-z][A-Za-z&,/'()\- ]{2,}")
+PAGE_REFERENCE_BEFORE = re.compile(r'(?i)\bpage\s*$')
+PAGE_REFERENCE_AFTER = re.compile(r'(?i)\s*(of|/)\s*\d')
+
+# Function to score a section number candidate from its shape and its surroundings in the TOC text
+def score_section_candidate(text, number, start, end):
+    shape = re.sub(r'\d', 'N', number)
+    score = SECTION_SHAPE_SCORES.get(shape, 0)
+
+    line_start = text.rfind('\n', 0, start) + 1
+    line_end = text.find('\n', end)
+    line_end = len(text) if line_end == -1 else line_end
+    before = text[line_start:start]
+    after = text[end:line_end]
+
+    # Layout: TOC entries start their line, optionally after the word SECTION
+    if before.rstrip().upper().endswith('SECTION'):
+        score += 0.35
+    elif not before.strip():
+        score += 0.15
+
+    # A title follows on the same line, or on the next line when the TOC columns were extracted as separate lines
+    if SECTION_TITLE_PATTERN_AFTER.match(after):
+        score += 0.25
+    elif not after.strip():
+        next_line_end = text.find('\n', line_end + 1)
+        next_line = text[line_end + 1:len(text) if next_line_end == -1 else next_line_end]
+        if SECTION_TITLE_PATTERN_AFTER.match(next_line):
+            score += 0.2
+
+    digits = number.replace(' ', '').rstrip('-')
+    division = int(digits[:2])
+    if len(digits) == 6:
+        score += 0.1 if division in MASTERFORMAT_2004_DIVISIONS else -0.45
+    elif len(digits) == 5:
+        score += 0.1 if division in MASTERFORMAT_1995_DIVISIONS else -0.45
+    elif shape == 'NNNN' and 1900 <= int(digits) <= 2099:
+        score -= 0.4
+
+    # Page numbers ("Page 1234", "1234 of 1300"), phone numbers and dates ("904-665", "2023/01")
+    if PAGE_REFERENCE_BEFORE.search(before) or PAGE_REFERENCE_AFTER.match(after):
+        score -= 0.4
+    if text[start - 1:start] in ('-', '/', '(', '$') or re.match(r'[-/]\d', text[end:end + 2]):
+        score -= 0.3
+
+    return min(max(score, 0.0), 1.0)
+
+# Function to score every section number candidate of the TOC text in one pass; returns the highest confidence of
+# each unique number, in order of first occurrence
+def score_section_numbers(text, section_pattern=SECTION_NUMBER_PATTERN):
+    confidences = {}
+    for match in section_pattern.finditer(text):
+        number = match.group(1) if match.groups() else match.group(0)
+        confidence = score_section_candidate(text, number, match.start(), match.end())
+        confidences[number] = max(confidence, confidences.get(number, 0.0))
+    return confidences
+
+# Function to extract unique section numbers from the text. Candidates whose confidence is below min_confidence
+# (SECTION_CONFIDENCE_THRESHOLD by default) are dropped; a custom section_pattern keeps every match, as before.
+def extract_section_numbers(text, section_pattern=None, min_confidence=None):
+    if section_pattern is not None:
+        section_numbers = section_pattern.findall(text)
+        seen = set()
+        unique_section_numbers = [x for x in section_numbers if not (x in seen or seen.add(x))]
+        return unique_section_numbers
+    if min_confidence is None:
+        min_confidence = SECTION_CONFIDENCE_THRESHOLD
+    confidences = score_section_numbers(text)
+    return [number for number, confidence in confidences.items() if confidence >= min_confidence]
+
+ADDON_SUFFIX_PATTERN = re.compile(r'\.\d{2}')
+
+# Function to find addons ("<section>.NN" children) for section numbers in one pass over the text.
+# Every ".NN" suffix is an anchor; the text just before it is looked up for each distinct section number length,
+# which gives the same matches, in the same order, as one non-overlapping findall per section number.
+def find_addons(text, section_numbers):
+    sections = set(section_numbers)
+    lengths = sorted({len(section) for section in sections if section})
+    matches = {section: [] for section in sections}
+    last_end = dict.fromkeys(sections, 0)
+    for suffix in ADDON_SUFFIX_PATTERN.finditer(text):
+        suffix_start, suffix_end = suffix.span()
+        for length in lengths:
+            start = suffix_start - length
+            if start < 0:
+                break
+            section = text[start:suffix_start]
+            if section in sections and start >= last_end[section]:
+                matches[section].append(text[start:suffix_end])
+                last_end[section] = suffix_end
+    if '' in sections:
+        matches[''] = ADDON_SUFFIX_PATTERN.findall(text)
+
+    addons = []
+    for section in section_numbers:
+        addons.extend(matches[section])
+    return addons
+
+# Patterns used by the single-pass section index; numbers may carry an addon suffix ("26 05 19.13", "013300.01")
+SECTION_TOKEN_PATTERN = re.compile(r'SECTION((?: \d+(?:\.\d{2})?)*)( -)?')
+SECTION_TITLE_PATTERN = re.compile(r'\s+(.*?)\n')
+END_OF_SECTION = "END OF SECTION"
+
+# Function to build an index of every "SECTION xx xx xx" heading in one pass over the text.
+# Each heading is registered under every numbering prefix it spells ("SECTION 01 33", "SECTION 01 33 00",
+# "SECTION 013 -", ...) so lookups behave like the old per-section regex search: the first occurrence
+# wins and the section runs up to the next "END OF SECTION".
+def build_section_index(text):
+    section_index = {}
+    pending = {}  # heading -> (start, heading_end) for headings still waiting for their END OF SECTION
+    end_prefix = END_OF_SECTION[:-len("SECTION")]
+    for match in SECTION_TOKEN_PATTERN.finditer(text):
+        start = match.start()
+        if text.startswith(end_prefix, start - len(end_prefix)):
+            end = start + len("SECTION")
+            for heading, (heading_start, heading_end) in pending.items():
+                title_match = SECTION_TITLE_PATTERN.match(text, heading_end, end)
+                section_name = title_match.group(1) if title_match else 'Unknown'
+                section_index[heading] = (heading_start, end, section_name)
+            pending = {}
+
+        for heading, heading_end in section_headings(text, match):
+            if heading not in section_index and heading not in pending:
+                pending[heading] = (start, heading_end)
+    return section_index
+
+# Function to list the headings a SECTION_TOKEN_PATTERN match spells, as (heading, heading_end) pairs: every
+# numbering prefix ("SECTION 01 33", "SECTION 01 33 00", "SECTION 013 -", ...) that is followed by whitespace
+def section_headings(text, match):
+    numbers = match.group(1).split()
+    candidates = []
+    heading_end = match.start(1)
+    for i, number in enumerate(numbers):
+        heading_end += len(number) + 1
+        candidates.append(("SECTION " + " ".join(numbers[:i + 1]), heading_end))
+    if candidates and match.group(2):
+        candidates.append((candidates[-1][0] + " -", match.end(2)))
+    return [(heading, heading_end) for heading, heading_end in candidates
+            if text[heading_end:heading_end + 1].isspace()]
+
+# Function to extract specific section based on heading and capture the section name
+def extract_section(text, section_heading, section_index=None):
+    if section_index is None:
+        section_index = build_section_index(text)
+    entry = section_index.get(section_heading)
+    if entry:
+        start, end, section_name = entry
+        return text[start:end], section_name
+    return None, None
+
+# Article headings that hold submittal requirements; SUBMITTAL_HEADING_TYPES (comma separated) overrides them
+SUBMITTAL_HEADING_TYPES = tuple(
+    heading_type.strip() for heading_type in os.getenv(
+        "SUBMITTAL_HEADING_TYPES",
+        "SUBMITTALS,ACTION SUBMITTALS,INFORMATIONAL SUBMITTALS,CLOSEOUT SUBMITTALS,SHOP DRAWING SUBMITTALS").split(',')
+    if heading_type.strip())
+
+NUMBERED_ARTICLE_PATTERN = re.compile(r'\n[ \t]*\d+\.\d+')
+NUMBERED_ARTICLE_PREFIX_PATTERN = re.compile(r'[ \t]*\d+\.\d+[ \t]+')
+# What may follow a heading type on an unnumbered heading line: an optional colon, then the end of the line
+HEADING_LINE_END_PATTERN = re.compile(r'[ \t]*:?[ \t]*(?:\n|\Z)')
+
+# Function to prepare the search for a set of heading types: their longest common suffix ("SUBMITTALS" for the
+# default types), found with plain substring search, and the types from longest to shortest, so that
+# "ACTION SUBMITTALS" is not taken for "SUBMITTALS"
+@functools.lru_cache(maxsize=8)
+def _heading_type_anchor(heading_types):
+    heading_types = sorted(heading_types, key=len, reverse=True)
+    anchor = os.path.commonprefix([heading_type[::-1] for heading_type in heading_types])[::-1]
+    return anchor, heading_types
+
+# Generator of the (start, heading_type) of every heading type in the text, as whole words
+def _find_heading_types(text, heading_types):
+    anchor, heading_types = _heading_type_anchor(tuple(heading_types))
+    if not anchor:
+        alternation = "|".join(re.escape(heading_type) for heading_type in heading_types)
+        for match in re.finditer(rf'\b(?:{alternation})\b', text):
+            yield match.start(), match.group(0)
+        return
+    position = text.find(anchor)
+    while position != -1:
+        end = position + len(anchor)
+        if not text[end:end + 1].isalnum():
+            for heading_type in heading_types:
+                start = end - len(heading_type)
+                if start >= 0 and text.startswith(heading_type, start) and not text[start - 1:start].isalnum():
+                    yield start, heading_type
+                    break
+        position = text.find(anchor, end)
+
+# Function to return the spans of the submittal articles of a section as non-overlapping (start, end, heading_type)
+# tuples in text order. Articles are headed by an "N.NN" line, or by a line holding nothing but a heading type and
+# an optional colon; body text mentioning a heading type ("SUBMITTALS shall be in PDF") is not a heading. A span
+# starts at the heading type and runs up to the next article heading of either kind. The text is scanned once for
+# the heading types, and from each submittal article on for the heading that ends it.
+def scan_submittal_articles(text, heading_types=SUBMITTAL_HEADING_TYPES):
+    headings = []
+    for start, heading_type in _find_heading_types(text, heading_types):
+        line_start = text.rfind('\n', 0, start) + 1
+        if headings and headings[-1][0] == line_start:
+            continue
+        prefix = text[line_start:start]
+        if NUMBERED_ARTICLE_PREFIX_PATTERN.fullmatch(prefix) or (
+                not prefix.strip() and HEADING_LINE_END_PATTERN.match(text, start + len(heading_type))):
+            headings.append((line_start, start, heading_type))
+
+    spans = []
+    for i, (_, start, heading_type) in enumerate(headings):
+        next_numbered = NUMBERED_ARTICLE_PATTERN.search(text, start)
+        end = next_numbered.start() if next_numbered else len(text)
+        if i + 1 < len(headings):
+            end = min(end, headings[i + 1][0] - 1)
+        spans.append((start, end, heading_type))
+    return spans
+
+# Function to join the submittal articles of a section into the submittals subsection. Returns the subsection (None
+# without articles) and the (start, end, heading_type) spans of the articles within it.
+def join_submittal_articles(text, heading_types=SUBMITTAL_HEADING_TYPES):
+    pieces = []
+    articles = []
+    length = 0
+    for start, end, heading_type in scan_submittal_articles(text, heading_types):
+        if pieces:
+            pieces.append("\n\n")
+            length += 2
+        pieces.append(text[start:end])
+        articles.append((length, length + end - start, heading_type))
+        length += end - start
+    return ("".join(pieces) if pieces else None), articles
+
+# Function to extract submittals subsection
+def extract_submittals_subsection(text, heading_types=SUBMITTAL_HEADING_TYPES):
+    return join_submittal_articles(text, heading_types)[0]
+
+# Function to sanitize sheet titles
+def sanitize_sheet_title(title):
+    invalid_chars = ['/', '\\', '?', '*', '[', ']', ':']
+    for char in invalid_chars:
+        title = title.replace(char, '')
+    return title[:31]  # Limit to 31 characters
+
+# Set to 0 to leave the consolidated "Submittal Log" sheet out of the Excel export
+SUBMITTAL_LOG_SHEET = os.getenv("SUBMITTAL_LOG_SHEET", "1") == "1"
+SUBMITTAL_LOG_COLUMNS = ["Section Number", "Section Name", "Submittal Type", "Item", "Description"]
+# Lettered paragraphs ("A. Product Data: ...") are the submittal items; numbered sub-paragraphs belong to them
+SUBMITTAL_ITEM_PATTERN = re.compile(r'\s*([A-Z])\.\s+(.*)')
+
+# Function to split the submittals of a section record into log rows, one per lettered item, tagged with the heading
+# type ("ACTION SUBMITTALS", ...) of the article they are listed under, see the record's articles spans. Articles
+# without lettered items give a single row.
+def submittal_log_rows(record):
+    rows = []
+    for start, end, submittal_type in record['articles']:
+        lines = record['content'][start:end].split('\n')
+        items = []
+        for line in lines[1:]:
+            match = SUBMITTAL_ITEM_PATTERN.match(line)
+            if match:
+                items.append([match.group(1), match.group(2).strip()])
+            elif items and line.strip():
+                items[-1][1] += '\n' + line.strip()
+        if not items:
+            items = [['', '\n'.join(line.strip() for line in lines[1:]).strip()]]
+        for item, description in items:
+            rows.append([record['section_number'], record['section_name'], submittal_type, item, description])
+    return rows
+
+# Function to write the Excel export from the submittal records, see iter_submittal_records, in openpyxl's
+# write-only mode: a project info sheet, the optional Submittal Log sheet, then one sheet per section.
+# output is a path or a binary file object.
+def write_excel(project_name, records, output, submittal_log=None):
+    from openpyxl import Workbook
+
+    if submittal_log is None:
+        submittal_log = SUBMITTAL_LOG_SHEET
+
+    # Rows are streamed to disk as they are appended rather than kept as cell objects
+    wb = Workbook(write_only=True)
+
+    # Add the project name and title on the first sheet
+    ws = wb.create_sheet(title=sanitize_sheet_title("Project Info"))
+    ws.append([project_name])
+    ws.append(["EXTRACTED SUBMITTALS"])
+
+    if submittal_log:
+        ws = wb.create_sheet(title="Submittal Log")
+        ws.append(SUBMITTAL_LOG_COLUMNS)
+        for record in records:
+            if not record['master']:
+                for row in submittal_log_rows(record):
+                    ws.append(row)
+
+    # Write each section's content to a separate sheet, the full section title in the first cell
+    for record in records:
+        ws = wb.create_sheet(title=sanitize_sheet_title(record['heading']))
+        ws.append([record['heading']])
+        for line in record['content'].split('\n'):
+            ws.append([line])
+
+    wb.save(output)
+
+# Layout of the PDF export: letter pages with 1 inch margins, and the fonts of the Title, Heading1 and BodyText
+# styles of ReportLab's sample stylesheet as (font name, size, leading)
+PDF_PAGE_MARGIN = 72
+PDF_TITLE_FONT = ('Helvetica-Bold', 18, 22)
+PDF_HEADING_FONT = ('Helvetica-Bold', 18, 22)
+PDF_BODY_FONT = ('Helvetica', 10, 12)
+PDF_HEADING_SPACE_AFTER = 6
+# Set to 0 to leave the per-section bookmarks out of the PDF export
+PDF_BOOKMARKS = os.getenv("PDF_BOOKMARKS", "1") == "1"
+
+# Function to measure a word in a font; spec text repeats a small vocabulary, so widths are cached
+@functools.lru_cache(maxsize=65536)
+def _word_width(word, font_name, font_size):
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    return stringWidth(word, font_name, font_size)
+
+# Function to wrap a line of text to a width, breaking at spaces; a word wider than the line gets a line of its own
+def wrap_text_line(line, font_name, font_size, width):
+    space_width = _word_width(' ', font_name, font_size)
+    lines = []
+    current = []
+    current_width = 0
+    for word in line.split():
+        word_width = _word_width(word, font_name, font_size)
+        if current and current_width + space_width + word_width > width:
+            lines.append(' '.join(current))
+            current = []
+            current_width = 0
+        current_width += (space_width if current else 0) + word_width
+        current.append(word)
+    lines.append(' '.join(current))
+    return lines
+
+class PdfTextWriter:
+    """
+    Lays out lines of plain text on a ReportLab canvas, wrapping them to the page width and starting new pages as
+    needed. Each page is written as a single text object, and pages are emitted as they fill up, without building
+    and laying out a story of flowables first.
+    """
+
+    def __init__(self, canvas, page_size, margin=PDF_PAGE_MARGIN):
+        self.canvas = canvas
+        self.page_width, self.page_height = page_size
+        self.margin = margin
+        self.frame_width = self.page_width - 2 * margin
+        self.text = None
+        self.y = None
+
+    def _start_page(self):
+        self.text = self.canvas.beginText()
+        self.y = self.page_height - self.margin
+
+    def page_break(self):
+        """Finish the current page, if anything was written on it."""
+        if self.text is not None:
+            self.canvas.drawText(self.text)
+            self.canvas.showPage()
+            self.text = None
+
+    def write(self, text, font, centered=False, space_after=0):
+        """
+        Write text, wrapped to the frame width; line breaks in the text are kept.
+
+        Args:
+        - text (str): The text to write.
+        - font (tuple): The font name, size and leading.
+        - centered (bool, optional): Whether the lines are centered. Defaults to False.
+        - space_after (int, optional): The space left below the text, in points. Defaults to 0.
+        """
+        font_name, font_size, leading = font
+        for text_line in text.split('\n'):
+            for line in wrap_text_line(text_line, font_name, font_size, self.frame_width):
+                if self.text is None:
+                    self._start_page()
+                elif self.y - leading < self.margin:
+                    self.page_break()
+                    self._start_page()
+                self.y -= leading
+                x = self.margin
+                if centered:
+                    x = (self.page_width - _word_width(line, font_name, font_size)) / 2
+                self.text.setTextOrigin(x, self.y)
+                self.text.setFont(font_name, font_size, leading)
+                self.text.textOut(line)
+        if self.text is not None:
+            self.y -= space_after
+
+    def bookmark(self, title, key):
+        """
+        Add an outline entry pointing at the current page.
+
+        Args:
+        - title (str): The title shown in the outline.
+        - key (str): A key unique to the entry.
+        """
+        if self.text is None:
+            self._start_page()
+        self.canvas.bookmarkPage(key)
+        self.canvas.addOutlineEntry(title, key, level=0)
+
+# Function to create the PDF export from the submittal records, see iter_submittal_records: a title page, then each
+# section on new pages, optionally with a bookmark per section. Text is drawn as plain canvas text, which also keeps
+# "<" and "&" in the submittals from being read as Paragraph markup.
+def create_pdf(project_name, records, bookmarks=None):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen.canvas import Canvas
+
+    if bookmarks is None:
+        bookmarks = PDF_BOOKMARKS
+
+    buffer = BytesIO()
+    canvas = Canvas(buffer, pagesize=letter)
+    writer = PdfTextWriter(canvas, letter)
+
+    # Add project name and title
+    writer.write(project_name, PDF_TITLE_FONT, centered=True, space_after=PDF_HEADING_SPACE_AFTER)
+    writer.write("EXTRACTED SUBMITTALS", PDF_TITLE_FONT, centered=True, space_after=PDF_HEADING_SPACE_AFTER)
+
+    for i, record in enumerate(records):
+        writer.page_break()
+        if bookmarks:
+            writer.bookmark(record['heading'], f"section-{i}")
+        writer.write(record['heading'], PDF_HEADING_FONT, space_after=PDF_HEADING_SPACE_AFTER)
+        writer.write(record['content'], PDF_BODY_FONT)
+
+    writer.page_break()
+    if bookmarks and records:
+        canvas.showOutline()
+    canvas.save()
+    buffer.seek(0)
+    return buffer
+
+# Set to 0 to find the sections by scanning the text of every page instead of the bookmarks and page heading probe
+PDF_SECTION_LOCATOR = os.getenv("PDF_SECTION_LOCATOR", "1") == "1"
+
+# Sections are extracted in batches spanning about this many pages; only the pages of the current batch are kept
+# in memory, so working memory does not grow with the size of the spec book
+SECTION_BATCH_PAGES = int(os.getenv("SECTION_BATCH_PAGES", "256"))
+
+class SectionPageReader:
+    """
+    Extracts sections from the pages they span only, using the page map of pdf_text_extraction.locate_section_pages.
+
+    Pages are kept until release is called. Pages already in the shared document of the PDF (see
+    spec_document.get_document), such as the TOC pages, are copied from it rather than extracted again; the pages
+    this reader extracts are not added to it, so that its memory stays bounded by a batch. A section missing from the
+    page map is reported as not found. When the map is empty (no bookmarks nor headings found, or the locator turned
+    off), the sections are found by scanning the text of every page for their headings, one batch at a time.
+
+    Attributes:
+    - document (SpecDocument): The shared document of the PDF.
+    - section_pages (dict): The (first_page, last_page) range of each located section, keyed by section digits.
+    - page_texts (dict): The text of the pages read since the last release and of those it kept, keyed by zero-based
+      page number.
+    - pool (PagePool): The page extraction processes, shared by the page probe and every batch until close.
+    - pages_extracted (int): The number of pages extracted so far by this reader.
+    - pages_planned (int): The number of pages expected to be extracted, used for progress reports.
+    """
+
+    def __init__(self, pdf_file, section_numbers, max_workers=None, progress=None):
+        from pdf_text_extraction import PagePool, locate_section_pages
+        from spec_document import get_document
+        self.pdf_file = pdf_file
+        self.document = get_document(pdf_file)
+        self.max_workers = max_workers
+        self.pool = PagePool(pdf_file, max_workers)
+        self.progress = progress or (lambda stage, done, total: None)
+        self.section_pages = {}
+        if PDF_SECTION_LOCATOR:
+            try:
+                self.section_pages = locate_section_pages(
+                    pdf_file, section_numbers, max_workers, lambda done, total: self.progress('locate', done, total),
+                    self.pool)
+            except BaseException:
+                self.pool.close()
+                raise
+        self.page_texts = {}
+        self.pages_extracted = 0
+        self.pages_planned = 0
+        if not self.section_pages:
+            try:
+                self.section_pages = self._scan_section_pages(section_numbers)
+            except BaseException:
+                self.close()
+                raise
+
+    def _scan_section_pages(self, section_numbers):
+        # Each section runs from the first page its heading is on to the page of the next END OF SECTION, as in
+        # build_section_index; only the page numbers are kept, the page texts are dropped batch by batch
+        from pdf_text_extraction import section_digits
+        wanted = {f"SECTION {section_number}": section_digits(section_number) for section_number in section_numbers}
+        section_pages = {}
+        pending = {}  # heading -> first page, for headings still waiting for their END OF SECTION
+        seen = set()
+        self.pages_planned = self.document.page_count
+        for batch_start in range(0, self.document.page_count, SECTION_BATCH_PAGES):
+            page_numbers = range(batch_start, min(batch_start + SECTION_BATCH_PAGES, self.document.page_count))
+            self._extract_pages(page_numbers)
+            for page_num in page_numbers:
+                text = self.page_texts[page_num]
+                end = text.rfind(END_OF_SECTION)
+                for match in SECTION_TOKEN_PATTERN.finditer(text):
+                    for heading, _ in section_headings(text, match):
+                        if heading in wanted and heading not in seen:
+                            seen.add(heading)
+                            pending[heading] = (page_num, match.start())
+                for heading, (first_page, start) in list(pending.items()):
+                    if end > start or (end >= 0 and first_page < page_num):
+                        section_pages.setdefault(wanted[heading], (first_page, page_num))
+                        del pending[heading]
+            self.release()
+        return section_pages
+
+    def _page_range(self, section_number):
+        from pdf_text_extraction import section_digits
+        digits = section_digits(section_number)
+        pages = self.section_pages.get(digits)
+        if pages is None and len(digits) >= 4:
+            # "SECTION 01 33" style lookups resolve to the first located section they are a prefix of
+            prefixed = [pages for located, pages in self.section_pages.items() if located.startswith(digits)]
+            pages = min(prefixed, default=None)
+        return range(pages[0], pages[1] + 1) if pages else None
+
+    def pages_of(self, section_numbers):
+        """
+        List the pages spanned by sections.
+
+        Args:
+        - section_numbers (list): The section numbers.
+
+        Returns:
+        - set: The zero-based page numbers of the located sections.
+        """
+        page_numbers = set()
+        for section_number in section_numbers:
+            page_numbers.update(self._page_range(section_number) or ())
+        return page_numbers
+
+    def _extract_pages(self, page_numbers):
+        from pdf_text_extraction import extract_pages
+        missing = []
+        for page_num in sorted(set(page_numbers) - self.page_texts.keys()):
+            if self.document.has_page(page_num):
+                self.page_texts[page_num] = self.document.page_text(page_num)
+            else:
+                missing.append(page_num)
+        if not missing:
+            return
+        done_before = self.pages_extracted
+        total = max(self.pages_planned, done_before + len(missing))
+        page_texts = extract_pages(self.pdf_file, missing, self.max_workers,
+                                   lambda done, _: self.progress('pages', done_before + done, total), self.pool)
+        self.page_texts.update(zip(missing, page_texts))
+        self.pages_extracted += len(missing)
+
+    def prefetch(self, section_numbers):
+        """
+        Extract the pages of several sections at once, so that they are spread over the page extraction workers.
+
+        Args:
+        - section_numbers (list): The section numbers that will be extracted.
+        """
+        self._extract_pages(self.pages_of(section_numbers))
+
+    def release(self, keep=()):
+        """
+        Drop the page texts read so far.
+
+        Args:
+        - keep (iterable, optional): The page numbers whose text is kept, such as the pages of the next batch.
+        """
+        keep = set(keep)
+        self.page_texts = {page_num: text for page_num, text in self.page_texts.items() if page_num in keep}
+
+    def close(self):
+        """Drop the page texts and stop the page extraction processes."""
+        self.release()
+        self.pool.close()
+
+    def extract_section(self, section_heading):
+        """
+        Extract a section and its name, like extract_section on the full text.
+
+        Args:
+        - section_heading (str): The heading of the section, "SECTION " followed by its number.
+
+        Returns:
+        - tuple: The text and the name of the section, or (None, None) if it is not found.
+        """
+        page_range = self._page_range(section_heading[len("SECTION "):])
+        if page_range is None:
+            return None, None
+        self._extract_pages(page_range)
+        return extract_section("".join(self.page_texts[page_num] for page_num in page_range), section_heading)
+
+# Function to group section numbers, in order, into batches whose sections span about SECTION_BATCH_PAGES pages
+def _section_batches(reader, section_numbers):
+    batch = []
+    batch_pages = set()
+    for section_number in section_numbers:
+        section_pages = reader.pages_of([section_number])
+        if batch and len(batch_pages | section_pages) > SECTION_BATCH_PAGES:
+            yield batch
+            batch = []
+            batch_pages = set()
+        batch.append(section_number)
+        batch_pages |= section_pages
+    if batch:
+        yield batch
+
+# Generator extracting sections in the order given; yields (section_number, section_text, section_name) with
+# (section_number, None, None) for the sections that are not found. The pages of a batch are extracted together and
+# dropped before the next batch, so only one batch of page texts is ever held; the page a batch shares with the next
+# one, where a section ends and the next starts, is kept rather than extracted again.
+def iter_sections(reader, section_numbers):
+    reader.pages_planned = len(reader.pages_of(section_numbers))
+    batches = list(_section_batches(reader, section_numbers))
+    for i, batch in enumerate(batches):
+        reader.prefetch(batch)
+        for section_number in batch:
+            section, section_name = reader.extract_section(f"SECTION {section_number}")
+            yield section_number, section, section_name
+        reader.release(reader.pages_of(batches[i + 1]) if i + 1 < len(batches) else ())
+
+# Generator turning the sections into submittal records, the master section first and in full, then the
+# "SUBMITTALS" subsection of every other section that has one. Each record is a dict with section_number,
+# section_name, heading ("SECTION xx xx xx - name"), content, articles (the (start, end, heading_type) spans of the
+# submittal articles in content, empty for the master section) and master keys.
+def iter_submittal_records(reader, section_numbers_array, special_section_number, progress=None):
+    if progress is None:
+        progress = lambda stage, done, total: None
+
+    # Remove the special section from the section numbers array
+    section_numbers_array = [number for number in section_numbers_array if number != special_section_number]
+    section_numbers = [special_section_number, *section_numbers_array]
+
+    for i, (section_number, section, section_name) in enumerate(iter_sections(reader, section_numbers)):
+        if i > 0:
+            progress('sections', i - 1, len(section_numbers_array))
+        if not section:
+            continue
+        # Handle the special section separately to keep the entire section
+        content, articles = (section, []) if i == 0 else join_submittal_articles(section)
+        if content:
+            yield {
+                'section_number': section_number,
+                'section_name': section_name,
+                'heading': f"SECTION {section_number} - {section_name}",
+                'content': content,
+                'articles': articles,
+                'master': i == 0,
+            }
+    progress('sections', len(section_numbers_array), len(section_numbers_array))
+
+# Number of exporter processes run at once (defaults to one per exporter, up to the CPU count). The exporters are
+# CPU-bound pure Python, so threads would hold the GIL in turn; with 1 the exporters run one after the other
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "0")) or min(3, os.cpu_count() or 1)
+# Exports of fewer records than this run serially; spawning the exporter processes and importing openpyxl and
+# ReportLab in them costs about a second
+EXPORT_PARALLEL_MIN_RECORDS = int(os.getenv("EXPORT_PARALLEL_MIN_RECORDS", "500"))
+# File names of the generated artifacts, keyed by artifact
+ARTIFACT_FILE_NAMES = {
+    'excel': '{project_name}_Extracted_SUBMITTALS_Sections.xlsx',
+    'docx': '{project_name}_Extracted_SUBMITTALS_Sections.docx',
+    'toc_docx': '{project_name}_TOC.docx',
+    'pdf': '{project_name}_Extracted_SUBMITTALS_Sections.pdf',
+}
+
+def _export_excel(project_name, records):
+    buffer = BytesIO()
+    write_excel(project_name, records, buffer)
+    return {'excel': buffer.getvalue()}
+
+def _export_docx(project_name, records):
+    from docx_report import write_docx_reports
+    buffer, toc_buffer = BytesIO(), BytesIO()
+    write_docx_reports(project_name, records, buffer, toc_buffer)
+    return {'docx': buffer.getvalue(), 'toc_docx': toc_buffer.getvalue()}
+
+def _export_pdf(project_name, records):
+    return {'pdf': create_pdf(project_name, records).getvalue()}
+
+# Function to generate the Excel, DOCX, TOC DOCX and PDF files from the submittal records, in memory, in a process
+# per exporter when there are enough records and CPUs (see EXPORT_WORKERS). Returns (file_name, bytes) keyed by
+# artifact, see ARTIFACT_FILE_NAMES; progress, if given, is called with (stage, done, total) as the exporters finish.
+def export_artifacts(project_name, records, progress=None, max_workers=None):
+    if progress is None:
+        progress = lambda stage, done, total: None
+
+    exporters = [_export_excel, _export_docx, _export_pdf]
+    artifacts = {}
+
+    def collect(done, exported):
+        for artifact, data in exported.items():
+            artifacts[artifact] = (ARTIFACT_FILE_NAMES[artifact].format(project_name=project_name), data)
+        progress('artifacts', done, len(exporters))
+
+    progress('artifacts', 0, len(exporters))
+    max_workers = min(max_workers or EXPORT_WORKERS, len(exporters))
+    if max_workers <= 1 or len(records) < EXPORT_PARALLEL_MIN_RECORDS:
+        for done, exporter in enumerate(exporters, start=1):
+            collect(done, exporter(project_name, records))
+    else:
+        # Spawned like the page extraction workers, since Streamlit runs the script alongside server threads
+        executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            futures = [executor.submit(exporter, project_name, records) for exporter in exporters]
+            for done, future in enumerate(as_completed(futures), start=1):
+                collect(done, future.result())
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    return {artifact: artifacts[artifact] for artifact in ARTIFACT_FILE_NAMES}
+
+# Function to bundle the artifacts into a single ZIP archive, built in memory
+def bundle_artifacts(artifacts):
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for file_name, data in artifacts.values():
+            archive.writestr(file_name, data)
+    return buffer.getvalue()
+
+# Function to run the whole extraction for the confirmed section numbers and generate the Excel, DOCX, TOC DOCX and PDF
+# files in memory. progress, if given, is called with (stage, done, total) for the locate, pages, sections and
+# artifacts stages. The files are also written to output_dir if one is given, and max_workers is the number of page
+# extraction processes. pdf_file is the path of the PDF (preferred, see pdf_text_extraction.open_pdf) or its content.
+def run_submittals_extraction(pdf_file, section_numbers_array, special_section_number, project_name, progress=None,
+                              output_dir=None, max_workers=None):
+    if progress is None:
+        progress = lambda stage, done, total: None
+
+    # Only the pages of the requested sections are extracted, rather than the whole spec book
+    reader = SectionPageReader(pdf_file, [special_section_number, *section_numbers_array], max_workers, progress)
+    try:
+        # Only the submittal records are kept; the section texts and their pages are dropped as the records are made
+        records = list(iter_submittal_records(reader, section_numbers_array, special_section_number, progress))
+    finally:
+        reader.close()
+    all_extracted_content = "".join(f"{record['heading']}\n{record['content']}\n\n" for record in records)
+    toc_entries = [record['heading'] for record in records if not record['master']]
+
+    artifacts = export_artifacts(project_name, records, progress)
+    if output_dir is not None:
+        for file_name, data in artifacts.values():
+            with open(os.path.join(output_dir, file_name), 'wb') as f:
+                f.write(data)
+
+    return {
+        'pages_extracted': reader.pages_extracted,
+        'section_pages': reader.section_pages,
+        'sections': records,
+        'all_extracted_content': all_extracted_content,
+        'toc_entries': toc_entries,
+        'artifacts': artifacts,
+    }
+
+
+# Function to read a batch manifest: a CSV file with pdf, project_name, toc_start, toc_end and master_section columns,
+# or a JSON list of objects with the same keys. Relative PDF paths are resolved against the manifest's directory.
+def load_manifest(manifest_path):
+    with open(manifest_path, newline='', encoding='utf-8') as f:
+        if manifest_path.lower().endswith('.json'):
+            rows = json.load(f)
+        else:
+            rows = list(csv.DictReader(f))
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    spec_books = []
+    for row in rows:
+        pdf_path = os.path.join(base_dir, row['pdf'])
+        spec_books.append({
+            'pdf': pdf_path,
+            'project_name': row.get('project_name') or os.path.splitext(os.path.basename(pdf_path))[0],
+            'toc_start': int(row['toc_start']),
+            'toc_end': int(row['toc_end']),
+            'master_section': str(row['master_section']).strip(),
+        })
+    return spec_books
+
+# Function to list every PDF of a directory as a spec book sharing the same TOC range and master section number
+def load_directory(input_dir, toc_start, toc_end, master_section):
+    return [{
+        'pdf': os.path.join(input_dir, name),
+        'project_name': os.path.splitext(name)[0],
+        'toc_start': toc_start,
+        'toc_end': toc_end,
+        'master_section': master_section,
+    } for name in sorted(os.listdir(input_dir)) if name.lower().endswith('.pdf')]
+
+# Function to run the whole pipeline on one spec book, used by the batch workers; returns its timing summary
+def process_spec_book(spec_book, output_dir, page_workers=1, min_confidence=None):
+    timings = {'pdf': spec_book['pdf'], 'project_name': spec_book['project_name']}
+    start = time.perf_counter()
+    try:
+        pdf_file = spec_book['pdf']
+        _, all_section_numbers = find_section_numbers(pdf_file, spec_book['toc_start'], spec_book['toc_end'], min_confidence)
+        timings['toc_s'] = time.perf_counter() - start
+
+        stage_started = {'locate': time.perf_counter()}
+        def progress(stage, done, total):
+            stage_started.setdefault(stage, time.perf_counter())
+        extraction_result = run_submittals_extraction(pdf_file, all_section_numbers, spec_book['master_section'],
+                                                      spec_book['project_name'], progress, output_dir, page_workers)
+        end = time.perf_counter()
+        timings['pages_s'] = stage_started.get('sections', end) - stage_started['locate']
+        timings['artifacts_s'] = end - stage_started.get('artifacts', end)
+        timings['pages'] = extraction_result['pages_extracted']
+        timings['sections'] = len(all_section_numbers)
+        timings['submittals'] = len(extraction_result['toc_entries'])
+        timings['status'] = 'ok'
+    except Exception as e:
+        timings['status'] = f'failed: {e}'
+    timings['total_s'] = time.perf_counter() - start
+    return timings
+
+# Function to process spec books across a process pool, printing a line as each one finishes
+def run_batch(spec_books, output_dir, workers=None, page_workers=1, min_confidence=None):
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [executor.submit(process_spec_book, spec_book, output_dir, page_workers, min_confidence) for spec_book in spec_books]
+        for future in as_completed(futures):
+            timings = future.result()
+            results.append(timings)
+            print(f"[{len(results)}/{len(spec_books)}] {timings['project_name']}: {timings['status']} "
+                  f"in {timings['total_s']:.1f} s", file=sys.stderr)
+    return results
+
+# Function to print the per-file timing summary of a batch
+def print_timing_summary(results, file=sys.stdout):
+    columns = ['project_name', 'status', 'pages', 'sections', 'submittals', 'toc_s', 'pages_s', 'artifacts_s', 'total_s']
+    rows = [[f"{row[column]:.2f}" if isinstance(row.get(column), float) else str(row.get(column, '')) for column in columns]
+            for row in sorted(results, key=lambda row: row['project_name'])]
+    widths = [max(len(column), *(len(row[i]) for row in rows)) if rows else len(column) for i, column in enumerate(columns)]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)), file=file)
+    for row in rows:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)), file=file)
+    total = sum(row['total_s'] for row in results)
+    print(f"{len(results)} spec books, {sum(row['status'] == 'ok' for row in results)} succeeded, "
+          f"{total:.1f} s of processing", file=file)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract submittals from many spec books without the web interface.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--manifest", help="CSV or JSON manifest with pdf, project_name, toc_start, toc_end and master_section")
+    source.add_argument("--input-dir", help="Directory of PDFs sharing the TOC range and master section given below")
+    parser.add_argument("--toc-start", type=int, help="First TOC page, with --input-dir")
+    parser.add_argument("--toc-end", type=int, help="Last TOC page, with --input-dir")
+    parser.add_argument("--master-section", help="Submittals master section number, with --input-dir")
+    parser.add_argument("--output-dir", required=True, help="Directory the Excel, DOCX and PDF files are written to")
+    parser.add_argument("--workers", type=int, default=None, help="Spec books processed at once (default: CPU count)")
+    parser.add_argument("--page-workers", type=int, default=1, help="Page extraction processes per spec book (default: 1)")
+    parser.add_argument("--min-confidence", type=float, default=None,
+                        help=f"Minimum section number confidence, 0 to 1 (default: {SECTION_CONFIDENCE_THRESHOLD})")
+    args = parser.parse_args(argv)
+
+    if args.manifest:
+        spec_books = load_manifest(args.manifest)
+    else:
+        if args.toc_start is None or args.toc_end is None or not args.master_section:
+            parser.error("--input-dir requires --toc-start, --toc-end and --master-section")
+        spec_books = load_directory(args.input_dir, args.toc_start, args.toc_end, args.master_section)
+
+    results = run_batch(spec_books, args.output_dir, args.workers, args.page_workers, args.min_confidence)
+    print_timing_summary(results)
+    return 0 if all(row['status'] == 'ok' for row in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,181 +1,188 @@
 import streamlit as st
-import fitz  # PyMuPDF
-import re
-from openpyxl import Workbook
-from docx import Document
-from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-from docx.oxml.ns import qn
-from docx.oxml import OxmlElement
-import openai
-from dotenv import load_dotenv
 import os
-import faiss
-import numpy as np
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-import requests
-import time
-from openai import Client
-from assistant import run_OpenAI_assistant
-from pypdf import PdfWriter
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from io import BytesIO
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+import threading
+import importlib
+from dotenv import load_dotenv
+from pipeline_cache import spool_pdf, make_cache_key, load_cached_result, store_cached_result
+from extraction_jobs import submit_job, get_job, cancel_job, forget_job
+from submittals_pipeline import find_section_numbers, run_submittals_extraction, bundle_artifacts
+
+# Heavy dependencies (PyMuPDF, FAISS, OpenAI, openpyxl, python-docx, ReportLab) are imported inside the
+# functions that use them, so the first paint of the page does not wait for features the user has not touched yet.
+# Check with: python import_time_report.py. numpy is not listed: st.image imports it when the page draws its logo.
+HEAVY_MODULES = ["fitz", "openai", "tenacity", "faiss", "openpyxl", "docx", "reportlab.pdfgen.canvas"]
 
 # Load environment variables
 load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
 
-# Function to extract text from specified table of content pages of uploaded PDF (Specs)
-def extract_text_from_pdf(file, start_page, end_page):
-    document = fitz.open(stream=file, filetype="pdf")
-    text = ""
-    for page_num in range(start_page - 1, end_page):
-        page = document.load_page(page_num)
-        text += page.get_text()
-    return text
-
-# Function to extract text from entire PDF
-def extract_full_text_from_pdf(file):
-    document = fitz.open(stream=file, filetype="pdf")
-    text = ""
-    for page_num in range(document.page_count):
-        page = document.load_page(page_num)
-        text += page.get_text()
-    return text
-
-# Function to extract unique section numbers from the text
-def extract_section_numbers(text, section_pattern=None):
-    if section_pattern is None:
-        section_pattern = re.compile(
-            r'(\b\d{2} \d{2} \d{2}\b|\b\d{6}\b|\b\d{3} \d{3}\b|\b\d{2} \d{4}\b|'
-            r'\b\d{5}\b|\b\d{2} \d{3}\b|\b\d{3} \d{2}\b|'
-            r'\b\d{4}\b|\b\d{2} \d{2}\b|'
-            r'\b\d{3} \-)', re.MULTILINE)  
-    section_numbers = section_pattern.findall(text)
-    seen = set()
-    unique_section_numbers = [x for x in section_numbers if not (x in seen or seen.add(x))]
-    return unique_section_numbers
-
-# Function to find addons for section numbers
-def find_addons(text, section_numbers):
-    addons = []
-    for section in section_numbers:
-        addon_pattern = re.compile(rf'{re.escape(section)}\.\d{{2}}')
-        addons.extend(addon_pattern.findall(text))
-    return addons
-
-# Function to extract specific section based on heading and capture the section name
-def extract_section(text, section_heading):
-    pattern = re.compile(rf'({section_heading}\s+.*?END OF SECTION)', re.DOTALL)
-    match = pattern.search(text)
-    if match:
-        name_pattern = re.compile(rf'{section_heading}\s+(.*?)\n')
-        name_match = name_pattern.search(match.group(1))
-        section_name = name_match.group(1) if name_match else 'Unknown'
-        return match.group(1), section_name
-    return None, None
-
-# Function to extract submittals subsection
-def extract_submittals_subsection(text):
-    submittal_types = ["SUBMITTALS", "ACTION SUBMITTALS", "INFORMATIONAL SUBMITTALS", "CLOSEOUT SUBMITTALS", "SHOP DRAWING SUBMITTALS"]
-    submittals = []
-    for submittal_type in submittal_types:
-        pattern = re.compile(rf'({submittal_type}.*?)(?=\n\d+\.\d+|\Z)', re.DOTALL)
-        match = pattern.search(text)
-        if match:
-            submittals.append(match.group(1))
-    return "\n\n".join(submittals) if submittals else None
-
-# Function to sanitize sheet titles
-def sanitize_sheet_title(title):
-    invalid_chars = ['/', '\\', '?', '*', '[', ']']
-    for char in invalid_chars:
-        title = title.replace(char, '')
-    return title[:31]  # Limit to 31 characters
-
-# Function to add a new heading with a page break
-def add_heading_with_page_break(doc, heading_text):
-    doc.add_page_break()
-    heading = doc.add_heading(level=1)
-    run = heading.add_run(heading_text)
-    run.bold = True
-    heading.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-
-# Add this function to create PDF
-def create_pdf(project_name, all_extracted_content):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-    story = []
-
-    # Add project name and title
-    story.append(Paragraph(project_name, styles['Title']))
-    story.append(Paragraph("EXTRACTED SUBMITTALS", styles['Title']))
-    story.append(PageBreak())
-
-    # Use existing styles or create new ones if they don't exist
-    if 'Heading1' not in styles:
-        styles.add(ParagraphStyle(name='Heading1', fontSize=14, spaceAfter=12))
-    if 'BodyText' not in styles:
-        styles.add(ParagraphStyle(name='BodyText', fontSize=10, spaceAfter=6))
-
-    # Process content
-    sections = all_extracted_content.strip().split('\n\n')
-    for section in sections:
-        section_lines = section.split('\n')
-        heading_text = section_lines[0]
-        content = section_lines[1:]
-
-        story.append(Paragraph(heading_text, styles['Heading1']))
-        for line in content:
-            story.append(Paragraph(line, styles['BodyText']))
-        story.append(PageBreak())
-
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
-
-# Function to chunk text
-def chunk_text(text):
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len,
-        separators=["\n\n", "\n", " ", ""]
-    )
-    chunks = text_splitter.split_text(text)
-    return chunks
-
-client = Client()
-# Function to get embeddings from OpenAI
+# Function to import the heavy dependencies in a background thread once per process (fast-start mode),
+# so they are usually loaded by the time the user first clicks a button
+@st.cache_resource(show_spinner=False)
+def warm_up_heavy_modules():
+    def import_all():
+        for module_name in HEAVY_MODULES:
+            try:
+                importlib.import_module(module_name)
+            except ImportError:
+                pass
+    thread = threading.Thread(target=import_all, name="import-warmup", daemon=True)
+    thread.start()
+    return thread
+
+# Function run by the background extraction job: extract, then cache the result
+def run_and_cache_submittals_extraction(cache_key, pdf_path, section_numbers_array, special_section_number, project_name, progress=None):
+    extraction_result = run_submittals_extraction(pdf_path, section_numbers_array, special_section_number, project_name, progress)
+    store_cached_result(cache_key, extraction_result)
+    return extraction_result
+
+# Function to register the files of a finished extraction for download; they are kept in memory, never written to disk
+def show_extraction_result(extraction_result):
+    st.session_state.artifacts = extraction_result['artifacts']
+    st.session_state.pop('artifacts_zip', None)
+    st.write(f"All sections and 'SUBMITTALS' subsections extracted into {len(extraction_result['toc_entries'])} submittals.")
+
+ARTIFACT_DOWNLOAD_LABELS = {
+    'excel': "Download all the Submittals in an Excel File",
+    'docx': "Download all the Submittals in a DOCX File",
+    'toc_docx': "Download all the Submittals TOC (Submittal Schedule) in a DOCX File",
+    'pdf': "Download all the Submittals in a PDF File (Chat with OpenAI)",
+}
+ARTIFACT_MIME_TYPES = {
+    'excel': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    'docx': "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    'toc_docx': "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    'pdf': "application/pdf",
+}
+
+EXTRACTION_STAGE_LABELS = {'locate': 'Section pages located', 'pages': 'Page extraction',
+                           'sections': 'Sections resolved', 'artifacts': 'Artifacts generated'}
+
+# Function to display the progress of the running extraction job, refreshed every second without rerunning the page
+@st.fragment(run_every=1)
+def show_extraction_progress(job_id):
+    job = get_job(job_id)
+    if job is None or job.finished:
+        st.rerun()
+    if job.status == 'queued':
+        st.info("Extraction queued, waiting for a free worker...")
+    for stage, label in EXTRACTION_STAGE_LABELS.items():
+        if stage in job.progress:
+            done, total = job.progress[stage]
+            st.progress(done / total if total else 1.0, text=f"{label}: {done}/{total}")
+    if st.button("Cancel extraction"):
+        cancel_job(job_id)
+
+# Function to chunk the pages of a spec along its SECTION, PART, article and paragraph structure; each chunk is a dict
+# with its text, section number and page
+def chunk_text(page_texts):
+    from spec_chunker import chunk_spec_pages
+    return chunk_spec_pages(page_texts)
+
+# Function to get embeddings, from the local embedding store or from OpenAI in batched, concurrent requests
 def get_embeddings(text_list):
-    embeddings = []
-    for text in text_list:
-        response = client.embeddings.create(
-            input=[text], 
-            model="text-embedding-ada-002"
-        )
-        embeddings.append(response.data[0].embedding)
-    return np.array(embeddings)
-
-# Function to store chunks and embeddings in FAISS
-def store_embeddings_in_faiss(chunks, embeddings):
-    dimension = len(embeddings[0])
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings)
+    from embeddings import embed_texts_cached
+    return embed_texts_cached(text_list)
+
+# Function to store chunks and embeddings in FAISS (Flat, HNSW or IVF-PQ depending on the corpus size),
+# persisting the index under index_key so it is not rebuilt for the same document
+def store_embeddings_in_faiss(chunks, embeddings, index_key=None):
+    from vector_index import build_index, save_index
+    index = build_index(embeddings)
+    if index_key:
+        save_index(index_key, index, chunks)
     return index, chunks
 
+# Function to load the FAISS index, chunks and lexical index of a spec, from its persisted index or by chunking and
+# embedding its pages. Returns a dict with index, chunks, lexical_index, built (whether embeddings were computed) and
+# nbytes, an estimate of the heap memory taken.
+def load_specifications(specifications_path, index_key):
+    from vector_index import load_index
+    from lexical_index import LexicalIndex
+    index, chunks = load_index(index_key)
+    built = index is None
+    if built:
+        from spec_document import get_document, release_document
+        chunks = chunk_text(get_document(specifications_path).iter_page_texts())
+        # The chunks hold the text from now on; the document is not kept next to them
+        release_document(specifications_path)
+        index, chunks = store_embeddings_in_faiss(chunks, get_embeddings([chunk['text'] for chunk in chunks]), index_key)
+    # The chunk texts are held twice (chunks and lexical index postings); the vectors count even when memory-mapped
+    nbytes = 2 * sum(len(chunk['text']) for chunk in chunks) + index.ntotal * index.d * 4
+    return {'index': index, 'chunks': chunks, 'lexical_index': LexicalIndex(chunks), 'built': built, 'nbytes': nbytes}
+
+# Function to get the indexes of a spec from the process-wide resource cache, keyed by the document hash, so every
+# session chatting with the same document shares them; returns a ResourceHandle pinning them
+def acquire_specifications(specifications_path, specifications_hash):
+    from embeddings import EMBEDDING_MODEL
+    from vector_index import make_index_key
+    from resource_cache import shared_cache
+    index_key = make_index_key(specifications_hash, EMBEDDING_MODEL)
+    return shared_cache.acquire(f"specifications:{index_key}", lambda: load_specifications(specifications_path, index_key),
+                                sizeof=lambda specifications: specifications['nbytes'])
+
+# Function to query FAISS index and get the ids of the relevant chunks, best first. query_embedding, if given, is
+# used instead of embedding the query again.
+def search_faiss_index(query, index, k=5, query_embedding=None):
+    import numpy as np
+    if query_embedding is None:
+        query_embedding = get_embeddings([query])[0]
+    D, I = index.search(np.array([query_embedding]), k=k)
+    return [i for i in I[0] if i >= 0]
+
 # Function to query FAISS index and get relevant chunks
 def query_faiss_index(query, index, chunks):
-    query_embedding = get_embeddings([query])[0]
-    D, I = index.search(np.array([query_embedding]), k=5)  # Get top 5 relevant chunks
-    return [chunks[i] for i in I[0]]
-
-# Function to get a response from OpenAI based on relevant text chunks
-def get_openai_response(query, relevant_chunks):
-    context = "\n\n".join(relevant_chunks)
+    return [chunks[i] for i in search_faiss_index(query, index)]  # Get top 5 relevant chunks
+
+# Function to get the ids of the relevant chunks of a query, best first: section number and rare term lookups are
+# answered from the lexical index without embedding the query; other queries fuse the lexical and FAISS rankings
+def search_specifications(query, index, lexical_index, k=5, query_embedding=None):
+    from lexical_index import route_query, fuse_rankings, FUSION_CANDIDATES
+    if route_query(query, lexical_index) == "lexical":
+        return [i for i, _ in lexical_index.search(query, k)]
+    lexical_ids = [i for i, _ in lexical_index.search(query, max(k, FUSION_CANDIDATES))]
+    vector_ids = search_faiss_index(query, index, max(k, FUSION_CANDIDATES), query_embedding)
+    return fuse_rankings([lexical_ids, vector_ids], k)
+
+# Function to get the relevant chunks of a query, see search_specifications
+def query_specifications(query, index, chunks, lexical_index, k=5, query_embedding=None):
+    return [chunks[i] for i in search_specifications(query, index, lexical_index, k, query_embedding)]
+
+# Function to answer a question about a spec, from the answer cache when the same or a near-identical question was
+# asked about the same document, otherwise by streaming a new answer into the page and caching it. The retrieved chunks
+# are deduped, reranked, packed under CONTEXT_TOKEN_BUDGET and merged before being sent, see context_budget.
+def answer_specifications_question(query, specifications, document_hash):
+    from answer_cache import answer_cache
+    from context_budget import assemble_context, CONTEXT_CANDIDATES, CONTEXT_BASELINE_CHUNKS
+    from lexical_index import route_query, key_tokens
+    lexical_index = specifications['lexical_index']
+    # Questions the lexical index answers alone are only looked up word for word, so they are never embedded;
+    # the others are embedded once, for the near-duplicate lookup and the FAISS search
+    embed = None
+    if route_query(query, lexical_index) == "hybrid":
+        embed = lambda: get_embeddings([query])[0]
+    query_key_tokens = key_tokens(query, lexical_index)
+    answer, query_embedding = answer_cache.lookup(document_hash, query, embed, query_key_tokens)
+    st.write("OpenAI: ")
+    if answer is not None:
+        st.write(answer)
+        st.caption("Cached answer")
+        return
+    chunk_ids = search_specifications(query, specifications['index'], lexical_index, CONTEXT_CANDIDATES,
+                                      query_embedding)
+    context = assemble_context(query, chunk_ids, specifications['chunks'], lexical_index)
+    answer = st.write_stream(get_openai_response(query, context['chunks'], stream=True))
+    st.caption(f"Context: ~{context['tokens']} tokens from {len(context['chunk_ids'])} chunks "
+               f"(~{context['baseline_tokens']} tokens for the top {CONTEXT_BASELINE_CHUNKS} chunks as retrieved)")
+    if answer:
+        answer_cache.put(document_hash, query, answer, query_embedding, query_key_tokens)
+
+# Function to get a response from OpenAI based on relevant text chunks.
+# With stream=True it returns a generator of the response text pieces as they are generated.
+def get_openai_response(query, relevant_chunks, stream=False):
+    from open_ai_api_calls import client
+    from spec_chunker import format_chunk
+    context = "\n\n".join(format_chunk(chunk) for chunk in relevant_chunks)
     prompt = f"Context: {context}\n\nQuery: {query}\n\nResponse:"
     response = client.chat.completions.create(
         model="gpt-4o-mini",
@@ -183,13 +190,30 @@ def get_openai_response(query, relevant_chunks):
             {"role": "system", "content": "You are an assistant that will extract information from a user uploaded pdf"},
             {"role": "user", "content": prompt},
         ],
-        max_tokens=500
+        max_tokens=500,
+        stream=stream
     )
+    if stream:
+        return (chunk.choices[0].delta.content for chunk in response if chunk.choices and chunk.choices[0].delta.content)
     return response.choices[0].message.content.strip()
 
+# Function to display an assistant response with custom styling
+def render_assistant_response(placeholder, response_text):
+    placeholder.markdown(
+        f"""
+        <div style='background-color: #ffffff; color: #000000; padding: 10px; border-radius: 10px; overflow-wrap: break-word;'>
+            <p style='color: #000000; font-size: 16px; line-height: 1.5;'>{response_text}</p>
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+
 # Streamlit UI Layout
 st.set_page_config(layout="wide")
 
+if os.getenv("SUBMITTALS_FAST_START", "1") == "1":
+    warm_up_heavy_modules()
+
 # Create a container for the header
 header = st.container()
 
@@ -226,18 +250,14 @@ st.markdown("<h2 style='text-align: left;'>We Build Life Changing Infrastructure
 # Define session state keys
 if 'section_numbers_array' not in st.session_state:
     st.session_state.section_numbers_array = None
-if 'pdf_file' not in st.session_state:
-    st.session_state.pdf_file = None
+if 'pdf_path' not in st.session_state:
+    st.session_state.pdf_path = None
 if 'project_name' not in st.session_state:
     st.session_state.project_name = None
 if 'special_section_number' not in st.session_state:
     st.session_state.special_section_number = None
-if 'output_excel_path' not in st.session_state:
-    st.session_state.output_excel_path = None
-if 'output_path' not in st.session_state:
-    st.session_state.output_path = None
-if 'all_extracted_content' not in st.session_state:
-    st.session_state.all_extracted_content = ""
+if 'artifacts' not in st.session_state:
+    st.session_state.artifacts = None
 
 st.header("Upload PDF and Provide Inputs about the Project and its Table of Contents (TOC)")
 uploaded_file = st.file_uploader("Choose a PDF file", type="pdf")
@@ -248,194 +268,78 @@ special_section_number = st.text_input("Enter the Submittals Master Section numb
 
 if st.button("Extract Section Numbers"):
     if uploaded_file is not None and start_page <= end_page and project_name and special_section_number:
-        pdf_file = uploaded_file.read()
-        pdf_text = extract_text_from_pdf(pdf_file, start_page, end_page)
-        section_numbers = extract_section_numbers(pdf_text)
+        # The upload is spooled to disk and opened by path, rather than its bytes being kept in the session
+        pdf_path, pdf_hash = spool_pdf(uploaded_file)
+        section_numbers, all_section_numbers = find_section_numbers(pdf_path, start_page, end_page)
         
         if section_numbers:
             st.write("Extracted Section Numbers:")
             st.write(section_numbers)
             
-            addons = find_addons(pdf_text, section_numbers)
-            all_section_numbers = section_numbers + [addon for addon in addons if addon not in section_numbers]
-            
             st.write("All Section Numbers (including addons):")
             st.write(all_section_numbers)
             
             st.session_state.section_numbers_array = all_section_numbers
-            st.session_state.pdf_file = pdf_file
+            st.session_state.pdf_path = pdf_path
             st.session_state.project_name = project_name
             st.session_state.special_section_number = special_section_number
-
-if st.session_state.section_numbers_array and st.session_state.pdf_file:
-    if st.button("Confirm and Extract Documents"):
-        pdf_file = st.session_state.pdf_file
-        pdf_text = extract_full_text_from_pdf(pdf_file)
-        section_numbers_array = st.session_state.section_numbers_array
-        special_section_number = st.session_state.special_section_number
-        project_name = st.session_state.project_name
-
-        # Initialize a variable to hold all extracted sections and submittals
-        all_extracted_content = ""
-
-        # Handle the special section separately to extract the entire section
-        special_section_heading = f"SECTION {special_section_number}"
-        special_section, special_section_name = extract_section(pdf_text, special_section_heading)
-
-        if special_section:
-            all_extracted_content += f"{special_section_heading} - {special_section_name}\n{special_section}\n\n"
-
-        # Remove the special section from the section numbers array
-        section_numbers_array = [number for number in section_numbers_array if number != special_section_number]
-
-        # Iterate over each section number, extract the section and then extract the "SUBMITTALS" subsection
-        toc_entries = []
-        for section_number in section_numbers_array:
-            section_heading = f"SECTION {section_number}"
-            extracted_section, section_name = extract_section(pdf_text, section_heading)
-
-            if extracted_section:
-                submittals_subsection = extract_submittals_subsection(extracted_section)
-
-                if submittals_subsection:
-                    all_extracted_content += f"{section_heading} - {section_name}\n{submittals_subsection}\n\n"
-                    toc_entries.append(f"{section_heading} - {section_name}")
-
-        # Create an Excel workbook
-        wb = Workbook()
-
-        # Add the project name and title on the first sheet
-        ws = wb.active
-        ws.title = sanitize_sheet_title("Project Info")
-        ws.append([project_name])
-        ws.append(["EXTRACTED SUBMITTALS"])
-
-        # Write each section's content to separate sheets
-        sections = all_extracted_content.strip().split('\n\n')
-        for section in sections:
-            section_lines = section.split('\n')
-            heading_text = section_lines[0]
-            content = section_lines[1:]
-
-            # Sanitize and truncate the sheet title
-            sheet_title = sanitize_sheet_title(heading_text)
-            ws = wb.create_sheet(title=sheet_title)
-
-            # Store the full section title in the first cell
-            ws.append([heading_text])
-            for line in content:
-                ws.append([line])
-
-        # Save the Excel workbook with the project name in the title
-        output_excel_path = f'{project_name}_Extracted_SUBMITTALS_Sections.xlsx'
-        wb.save(output_excel_path)
-        st.session_state.output_excel_path = output_excel_path
-        st.write(f"All sections and 'SUBMITTALS' subsections extracted and saved to {output_excel_path}")
-
-        # Create a Word document
-        doc = Document()
-
-        # Add the project name and title on the first page
-        project_title = doc.add_heading(project_name, level=1)
-        project_title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-
-        extracted_submittals_title = doc.add_heading('EXTRACTED SUBMITTALS', level=1)
-        extracted_submittals_title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-
-        # Create table of contents (TOC)
-        toc = doc.add_paragraph()
-        run = toc.add_run()
-        fldChar = OxmlElement('w:fldChar')
-        fldChar.set(qn('w:fldCharType'), 'begin')
-        run._r.append(fldChar)
-        instrText = OxmlElement('w:instrText')
-        instrText.set(qn('xml:space'), 'preserve')
-        instrText.text = r'TOC \o "1-3" \h \z \u'
-        run._r.append(instrText)
-        fldChar = OxmlElement('w:fldChar')
-        fldChar.set(qn('w:fldCharType'), 'separate')
-        run._r.append(fldChar)
-        fldChar = OxmlElement('w:fldChar')
-        fldChar.set(qn('w:fldCharType'), 'end')
-        run._r.append(fldChar)
-
-        # Add each section and its submittals to the document, starting each section on a new page
-        for section in all_extracted_content.strip().split('\n\n'):
-            section_lines = section.split('\n')
-            heading_text = section_lines[0]
-            content = '\n'.join(section_lines[1:])
-
-            add_heading_with_page_break(doc, heading_text)
-            doc.add_paragraph(content)
-
-        # Save the document with the project name in the title
-        output_path = f'{project_name}_Extracted_SUBMITTALS_Sections.docx'
-        doc.save(output_path)
-        st.session_state.output_path = output_path
-        st.write(f"All sections and 'SUBMITTALS' subsections extracted and saved to {output_path}")
-
-        # Create a Word document for the TOC
-        toc_doc = Document()
-
-        # Add TOC title
-        toc_title = toc_doc.add_heading('Table of Contents', level=1)
-        toc_title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-
-        # Add TOC entries to the TOC document
-        for entry in toc_entries:
-            toc_entry = toc_doc.add_paragraph()
-            toc_entry.add_run(entry)
-
-        # Save the TOC document
-        toc_output_path = f'{project_name}_TOC.docx'
-        toc_doc.save(toc_output_path)
-        st.session_state.toc_output_path = toc_output_path
-        st.write(f"Table of Contents extracted and saved to {toc_output_path}")
-        
-        st.session_state.all_extracted_content = all_extracted_content
-
-        # Create PDF
-        pdf_buffer = create_pdf(st.session_state.project_name, st.session_state.all_extracted_content)
-        pdf_output_path = f'{st.session_state.project_name}_Extracted_SUBMITTALS_Sections.pdf'
-        with open(pdf_output_path, 'wb') as f:
-            f.write(pdf_buffer.getvalue())
-        st.session_state.pdf_output_path = pdf_output_path
-        st.write(f"All sections and 'SUBMITTALS' subsections extracted and saved to {pdf_output_path}")
-
-# Display download buttons if documents are generated
-if st.session_state.output_excel_path and st.session_state.output_path:
-    with open(st.session_state.output_excel_path, "rb") as file:
-        st.download_button(
-            label="Download all the Submittals in an Excel File",
-            data=file,
-            file_name=st.session_state.output_excel_path,
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            st.session_state.pdf_hash = pdf_hash
+            st.session_state.toc_page_range = (start_page, end_page)
+
+if st.session_state.section_numbers_array and st.session_state.pdf_path:
+    if st.button("Confirm and Extract Documents", disabled='extraction_job_id' in st.session_state):
+        cache_key = make_cache_key(
+            st.session_state.pdf_hash,
+            *st.session_state.toc_page_range,
+            st.session_state.special_section_number,
+            st.session_state.project_name
         )
-
-    with open(st.session_state.output_path, "rb") as file:
-        st.download_button(
-            label="Download all the Submittals in a DOCX File",
-            data=file,
-            file_name=st.session_state.output_path,
-            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-        )
-    
-    if 'toc_output_path' in st.session_state:
-        with open(st.session_state.toc_output_path, "rb") as file:
-            st.download_button(
-                label="Download all the Submittals TOC (Submittal Schedule) in a DOCX File",
-                data=file,
-                file_name=st.session_state.toc_output_path,
-                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-            )
-if 'pdf_output_path' in st.session_state:
-    with open(st.session_state.pdf_output_path, "rb") as file:
-        st.download_button(
-            label="Download all the Submittals in a PDF File (Chat with OpenAI)",
-            data=file,
-            file_name=st.session_state.pdf_output_path,
-                mime="application/pdf"
+        extraction_result = load_cached_result(cache_key)
+        if extraction_result is None:
+            # Run the extraction in the background so the page stays responsive while it works
+            st.session_state.extraction_job_id = submit_job(
+                run_and_cache_submittals_extraction,
+                cache_key,
+                st.session_state.pdf_path,
+                st.session_state.section_numbers_array,
+                st.session_state.special_section_number,
+                st.session_state.project_name
             )
+        else:
+            st.info("Loaded the previously extracted submittals for this document.")
+            show_extraction_result(extraction_result)
+
+    if 'extraction_job_id' in st.session_state:
+        extraction_job = get_job(st.session_state.extraction_job_id)
+        if extraction_job is None or extraction_job.finished:
+            forget_job(st.session_state.pop('extraction_job_id'))
+            if extraction_job is None:
+                st.warning("The extraction job was lost (the server restarted). Please confirm again.")
+            elif extraction_job.status == 'done':
+                show_extraction_result(extraction_job.result)
+            elif extraction_job.status == 'cancelled':
+                st.warning("Extraction cancelled.")
+            else:
+                st.error(f"Extraction failed: {extraction_job.error}")
+        else:
+            show_extraction_progress(extraction_job.job_id)
+
+# Display download buttons if documents are generated
+if st.session_state.artifacts:
+    for artifact, label in ARTIFACT_DOWNLOAD_LABELS.items():
+        file_name, data = st.session_state.artifacts[artifact]
+        st.download_button(label=label, data=data, file_name=file_name, mime=ARTIFACT_MIME_TYPES[artifact],
+                           key=f"download_{artifact}")
+
+    # The ZIP archive is built once per extraction, in memory
+    if 'artifacts_zip' not in st.session_state:
+        st.session_state.artifacts_zip = bundle_artifacts(st.session_state.artifacts)
+    st.download_button(
+        label="Download all the Submittals files in a ZIP File",
+        data=st.session_state.artifacts_zip,
+        file_name=f"{st.session_state.project_name}_Extracted_SUBMITTALS.zip",
+        mime="application/zip"
+    )
 # Add new sections for comparison
 
 col1, col2 = st.columns(2)
@@ -447,25 +351,23 @@ with col1:
         if user_input_manual:
             assistant_id = "asst_EZQ9NL71x9QXNrncnzTqZMWv"  # Your assistant ID
             try:
-                # Call the run_OpenAI_assistant function to get the response
-                assistant_response = run_OpenAI_assistant(
+                from assistant import stream_OpenAI_assistant
+
+                # Stream the assistant response into the panel as it is generated
+                response_placeholder = st.empty()
+                assistant_result = {}
+                response_text = ""
+                for text in stream_OpenAI_assistant(
                     assistant_id=assistant_id,
                     prompt=user_input_manual,
-                    model='gpt-4o-mini'
-                )
-                
-                # Extract the main text content (assuming it's the first item in the list)
-                response_text = assistant_response[0] if isinstance(assistant_response, list) else assistant_response
-                
-                # Display the response with custom styling
-                st.markdown(
-                    f"""
-                    <div style='background-color: #ffffff; color: #000000; padding: 10px; border-radius: 10px; overflow-wrap: break-word;'>
-                        <p style='color: #000000; font-size: 16px; line-height: 1.5;'>{response_text}</p>
-                    </div>
-                    """, 
-                    unsafe_allow_html=True
-                )
+                    model='gpt-4o-mini',
+                    result=assistant_result
+                ):
+                    response_text += text
+                    render_assistant_response(response_placeholder, response_text)
+
+                if assistant_result['status'] != 'completed':
+                    render_assistant_response(response_placeholder, assistant_result['status'] or 'failed')
             except Exception as e:
                 st.write("Error: ", str(e))
 
@@ -475,30 +377,30 @@ with col2:
     
     if uploaded_specifications:
         # Compute embeddings only if they haven't been computed yet
-        if 'specifications_embeddings' not in st.session_state:
-            st.session_state.specifications_text = extract_full_text_from_pdf(uploaded_specifications.read())
-            specifications_chunks = chunk_text(st.session_state.specifications_text)
-            specifications_embeddings = get_embeddings(specifications_chunks)
-            st.session_state.specifications_index, st.session_state.specifications_stored_chunks = store_embeddings_in_faiss(specifications_chunks, specifications_embeddings)
-            st.session_state.specifications_embeddings = specifications_embeddings  # Store embeddings to prevent recomputation
-            st.success("Specifications uploaded and embeddings computed successfully.")
+        if 'specifications' not in st.session_state:
+            from resource_cache import shared_cache
+
+            specifications_path, specifications_hash = spool_pdf(uploaded_specifications)
+            # Sessions opening the same document share one copy of its indexes; the handle pins it for this session
+            st.session_state.specifications = acquire_specifications(specifications_path, specifications_hash)
+            st.session_state.specifications_hash = specifications_hash
+            if st.session_state.specifications.built and st.session_state.specifications.value['built']:
+                st.success("Specifications uploaded and embeddings computed successfully.")
+            else:
+                st.success("Specifications index loaded from a previous upload of this document.")
+            cache_stats = shared_cache.stats()
+            st.caption(f"Shared cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                       f"{cache_stats['entries']} resources, {cache_stats['nbytes'] / 1024 ** 2:.0f} MB")
         else:
             st.success("Specifications embeddings are already computed.")
     
     st.header("Chat with your Uploaded Document")
     user_input_specifications = st.text_input("You: ", key="user_input_specifications")
     if st.button("Chat", key="send_specifications"):
-        if user_input_specifications and 'specifications_index' in st.session_state:
-            # Query FAISS index using the stored embeddings and index
-            relevant_chunks_specifications = query_faiss_index(
-                user_input_specifications,
-                st.session_state.specifications_index,
-                st.session_state.specifications_stored_chunks
-            )
-            
-            # Get OpenAI response based on relevant chunks
-            response_specifications = get_openai_response(user_input_specifications, relevant_chunks_specifications)
-            st.write("OpenAI: ", response_specifications)
+        if user_input_specifications and 'specifications' in st.session_state:
+            # Answer from the cache or from OpenAI, based on the chunks found by the lexical and FAISS indexes
+            answer_specifications_question(user_input_specifications, st.session_state.specifications.value,
+                                           st.session_state.specifications_hash)
         else:
             st.warning("Please upload a pdf document first.")
 